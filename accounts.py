@@ -0,0 +1,89 @@
+import re
+from sqlalchemy import select, insert, update, bindparam
+from app import db
+from models import Account, Contractor
+
+# Anything but letters, digits and spaces is ignored when matching account names
+ACCOUNT_KEY_IGNORED = re.compile(r'[^\w\s]')
+
+def account_key(name):
+    """Normalize an account name for matching, or None for a blank name.
+    
+    Case, punctuation and runs of whitespace are ignored, so "Cozey Inc",
+    "Cozey Inc." and "COZEY  INC" share a key (and an Account).
+    """
+    if not name:
+        return None
+    return ' '.join(ACCOUNT_KEY_IGNORED.sub(' ', name).casefold().split()) or None
+
+def insert_accounts(rows):
+    """Insert new accounts, skipping keys created concurrently by another upload."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        db.session.execute(insert(Account), rows)
+        return
+    db.session.execute(dialect_insert(Account).on_conflict_do_nothing(index_elements=['key']), rows)
+
+def resolve_account_ids(names, account_ids=None):
+    """Map account names to Account ids, creating missing accounts in bulk.
+    
+    ``account_ids`` is a name -> id map kept across calls (an upload keeps
+    one for all its chunks): names already in it cost nothing, and the rest
+    are matched by key with one query, plus one insert and re-read when some
+    accounts are new. Blank names map to None. Returns the updated map.
+    """
+    account_ids = {} if account_ids is None else account_ids
+    keys = {}
+    for name in names:
+        if name in account_ids:
+            continue
+        key = account_key(name)
+        if key is None:
+            account_ids[name] = None
+        else:
+            keys[name] = key
+    if not keys:
+        return account_ids
+    
+    wanted = set(keys.values())
+    found = dict(db.session.execute(select(Account.key, Account.id).where(Account.key.in_(wanted))).all())
+    missing = wanted - found.keys()
+    if missing:
+        # The first spelling seen becomes the display name
+        spellings = {}
+        for name, key in keys.items():
+            spellings.setdefault(key, name.strip())
+        insert_accounts([{'key': key, 'name': spellings[key]} for key in missing])
+        found.update(db.session.execute(select(Account.key, Account.id).where(Account.key.in_(missing))).all())
+    
+    for name, key in keys.items():
+        account_ids[name] = found[key]
+    return account_ids
+
+def backfill_account_ids():
+    """Link contractors that have an account name but no account id.
+    
+    Run by `flask init-db`, so databases that predate the account_id column
+    get linked; a no-op once they are. Returns the number of distinct names
+    resolved.
+    """
+    names = db.session.execute(
+        select(Contractor.account_name).distinct()
+        .where(Contractor.account_id.is_(None), Contractor.account_name.isnot(None), Contractor.account_name != '')
+    ).scalars().all()
+    if not names:
+        return 0
+    
+    account_ids = resolve_account_ids(names)
+    table = Contractor.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.account_name == bindparam('b_name'), table.c.account_id.is_(None))
+        .values(account_id=bindparam('b_account_id')),
+        [{'b_name': name, 'b_account_id': account_ids[name]} for name in names]
+    )
+    return len(names)
@@ -0,0 +1,272 @@
+from decimal import Decimal
+from sqlalchemy import select, insert, update, delete, func, bindparam
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import Account, Contractor, ReviewQueue, DashboardAggregate
+
+# Contractor fields that feed the dashboard aggregates
+AGGREGATE_FIELDS = ('candidate_status', 'spread_amount', 'account_id', 'talent_end_date', 'created_at')
+
+def to_amount(value):
+    """Normalize a spread amount to a two-place Decimal (0 when missing)."""
+    if value is None:
+        return Decimal('0.00')
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+def contractor_state(contractor):
+    """Snapshot the aggregate-relevant fields of a Contractor."""
+    return {field: getattr(contractor, field) for field in AGGREGATE_FIELDS}
+
+def account_bucket(account_id):
+    """The 'client' bucket of an account: its id as text, '' for no account."""
+    return str(account_id) if account_id else ''
+
+def contractor_contributions(state):
+    """List the (metric, bucket, spread) buckets a contractor counts towards."""
+    spread = to_amount(state.get('spread_amount'))
+    contributions = [('contractors', '', spread)]
+    
+    created_at = state.get('created_at')
+    if created_at:
+        contributions.append(('created_month', created_at.strftime('%Y-%m'), spread))
+    
+    if state.get('candidate_status') == 'Current':
+        contributions.append(('active', '', spread))
+        contributions.append(('client', account_bucket(state.get('account_id')), spread))
+        if state.get('talent_end_date'):
+            contributions.append(('end_date', state['talent_end_date'].isoformat(), spread))
+    
+    return contributions
+
+class AggregateDelta:
+    """Accumulates count and spread changes to apply to DashboardAggregate.
+    
+    ``touched`` records that contractor rows were written at all, even when
+    no count or spread moved (a rename, a new job title), so the data version
+    still changes.
+    """
+    
+    def __init__(self):
+        self.changes = {}
+        self.touched = False
+    
+    def __bool__(self):
+        return any(count or total for count, total in self.changes.values())
+    
+    def bump(self, metric, bucket='', count=0, total=0):
+        current = self.changes.get((metric, bucket), (0, Decimal('0.00')))
+        self.changes[(metric, bucket)] = (current[0] + count, current[1] + to_amount(total))
+    
+    def add(self, state):
+        self.touched = True
+        for metric, bucket, spread in contractor_contributions(state):
+            self.bump(metric, bucket, 1, spread)
+    
+    def remove(self, state):
+        self.touched = True
+        for metric, bucket, spread in contractor_contributions(state):
+            self.bump(metric, bucket, -1, -spread)
+    
+    def change(self, old_state, new_state):
+        self.remove(old_state)
+        self.add(new_state)
+
+def apply_aggregate_delta(delta):
+    """Apply accumulated changes to the aggregate table in the current transaction.
+    
+    PostgreSQL increments atomically with INSERT ... ON CONFLICT DO UPDATE;
+    other backends update existing buckets and insert the new ones. Must be
+    called after the change itself has been issued in the same transaction.
+    """
+    if not aggregates_built():
+        # A full rebuild already reflects the change being recorded
+        rebuild_dashboard_aggregates()
+        return
+    
+    rows = [
+        {'metric': metric, 'bucket': bucket, 'count': count, 'total': total}
+        for (metric, bucket), (count, total) in delta.changes.items()
+        if count or total
+    ]
+    # Any contractor write moves the data version used by caches and ETags
+    if delta.touched:
+        rows.append({'metric': 'data_version', 'bucket': '', 'count': 1, 'total': 0})
+    if not rows:
+        return
+    
+    table = DashboardAggregate.__table__
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        
+        stmt = pg_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.metric, table.c.bucket],
+            set_={
+                'count': table.c.count + stmt.excluded.count,
+                'total': table.c.total + stmt.excluded.total
+            }
+        )
+        db.session.execute(stmt, rows)
+        return
+    
+    existing = set(db.session.execute(
+        select(table.c.metric, table.c.bucket)
+        .where(table.c.metric.in_({row['metric'] for row in rows}))
+        .where(table.c.bucket.in_({row['bucket'] for row in rows}))
+    ).all())
+    
+    updates = [row for row in rows if (row['metric'], row['bucket']) in existing]
+    inserts = [row for row in rows if (row['metric'], row['bucket']) not in existing]
+    if updates:
+        db.session.execute(
+            update(table)
+            .where(table.c.metric == bindparam('b_metric'), table.c.bucket == bindparam('b_bucket'))
+            .values(count=table.c.count + bindparam('b_count'), total=table.c.total + bindparam('b_total')),
+            [{'b_metric': row['metric'], 'b_bucket': row['bucket'],
+              'b_count': row['count'], 'b_total': row['total']} for row in updates]
+        )
+    if inserts:
+        db.session.execute(insert(table), inserts)
+
+def record_contractor_change(old_state=None, new_state=None):
+    """Apply the aggregate delta for one contractor being added, changed or removed."""
+    delta = AggregateDelta()
+    if old_state:
+        delta.remove(old_state)
+    if new_state:
+        delta.add(new_state)
+    apply_aggregate_delta(delta)
+
+def record_pending_reviews(change):
+    """Adjust the pending review count by ``change``."""
+    delta = AggregateDelta()
+    delta.bump('pending_reviews', count=change)
+    apply_aggregate_delta(delta)
+
+def get_pending_reviews_count():
+    """Return the open review item count from its counter row."""
+    row = db.session.get(DashboardAggregate, ('pending_reviews', ''))
+    if row is None and not aggregates_built():
+        ensure_dashboard_aggregates()
+        row = db.session.get(DashboardAggregate, ('pending_reviews', ''))
+    return row.count if row else 0
+
+def get_data_version():
+    """Return the counter bumped whenever contractor data changes."""
+    row = db.session.get(DashboardAggregate, ('data_version', ''))
+    return row.count if row else 0
+
+def rebuild_dashboard_aggregates():
+    """Recompute every dashboard aggregate from scratch with GROUP BY queries."""
+    data_version = get_data_version()
+    db.session.execute(delete(DashboardAggregate))
+    delta = AggregateDelta()
+    delta.bump('data_version', count=data_version + 1)
+    
+    total_count, total_spread = db.session.execute(
+        select(func.count(Contractor.id), func.sum(Contractor.spread_amount))
+    ).one()
+    delta.bump('contractors', count=total_count, total=total_spread)
+    
+    active = Contractor.candidate_status == 'Current'
+    active_count, active_spread = db.session.execute(
+        select(func.count(Contractor.id), func.sum(Contractor.spread_amount)).where(active)
+    ).one()
+    delta.bump('active', count=active_count, total=active_spread)
+    
+    for account_id, count, spread in db.session.execute(
+        select(Contractor.account_id, func.count(Contractor.id), func.sum(Contractor.spread_amount))
+        .where(active).group_by(Contractor.account_id)
+    ):
+        delta.bump('client', account_bucket(account_id), count, spread)
+    
+    for end_date, count, spread in db.session.execute(
+        select(Contractor.talent_end_date, func.count(Contractor.id), func.sum(Contractor.spread_amount))
+        .where(active, Contractor.talent_end_date.isnot(None)).group_by(Contractor.talent_end_date)
+    ):
+        delta.bump('end_date', end_date.isoformat(), count, spread)
+    
+    year = func.extract('year', Contractor.created_at)
+    month = func.extract('month', Contractor.created_at)
+    for created_year, created_month, count, spread in db.session.execute(
+        select(year, month, func.count(Contractor.id), func.sum(Contractor.spread_amount))
+        .where(Contractor.created_at.isnot(None)).group_by(year, month)
+    ):
+        delta.bump('created_month', f'{int(created_year):04d}-{int(created_month):02d}', count, spread)
+    
+    delta.bump('pending_reviews', count=ReviewQueue.query.filter_by(reviewed=False).count())
+    
+    rows = [
+        {'metric': metric, 'bucket': bucket, 'count': count, 'total': total}
+        for (metric, bucket), (count, total) in delta.changes.items()
+    ]
+    # Always write the contractors row; its presence marks the table as built
+    if not any(row['metric'] == 'contractors' for row in rows):
+        rows.append({'metric': 'contractors', 'bucket': '', 'count': 0, 'total': 0})
+    db.session.execute(insert(DashboardAggregate), rows)
+
+def aggregates_built():
+    """Whether the aggregate table has been populated."""
+    return db.session.get(DashboardAggregate, ('contractors', '')) is not None
+
+def ensure_dashboard_aggregates():
+    """Build the aggregate table on first use (e.g. right after an upgrade)."""
+    if aggregates_built():
+        return
+    try:
+        rebuild_dashboard_aggregates()
+        db.session.commit()
+    except IntegrityError:
+        # Another worker built it first
+        db.session.rollback()
+
+def get_dashboard_aggregates(today, quarter_end, top_clients=5):
+    """Read the dashboard figures from the aggregate table in constant time."""
+    ensure_dashboard_aggregates()
+    
+    scalars = {
+        row.metric: row for row in DashboardAggregate.query.filter(
+            DashboardAggregate.metric.in_(['contractors', 'active', 'pending_reviews']),
+            DashboardAggregate.bucket == ''
+        )
+    }
+    monthly = db.session.get(DashboardAggregate, ('created_month', today.strftime('%Y-%m')))
+    
+    falling_off_count, falling_off_spread = db.session.execute(
+        select(func.sum(DashboardAggregate.count), func.sum(DashboardAggregate.total))
+        .where(DashboardAggregate.metric == 'end_date',
+               DashboardAggregate.bucket >= today.isoformat(),
+               DashboardAggregate.bucket <= quarter_end.isoformat())
+    ).one()
+    
+    client_distribution = DashboardAggregate.query.filter(
+        DashboardAggregate.metric == 'client',
+        DashboardAggregate.count > 0
+    ).order_by(DashboardAggregate.count.desc()).limit(top_clients).all()
+    
+    # Buckets are account ids; only the top few rows need their names. Buckets
+    # keyed by name before accounts existed are skipped until `flask init-db` rebuilds them
+    client_distribution = [row for row in client_distribution if not row.bucket or row.bucket.isdigit()]
+    account_ids = [int(row.bucket) for row in client_distribution if row.bucket]
+    account_names = dict(db.session.execute(
+        select(Account.id, Account.name).where(Account.id.in_(account_ids))
+    ).all()) if account_ids else {}
+    
+    def scalar(metric, attr):
+        row = scalars.get(metric)
+        return getattr(row, attr) if row else 0
+    
+    return {
+        'total_contractors': scalar('contractors', 'count'),
+        'active_contractors': scalar('active', 'count'),
+        'current_active_spread': scalar('active', 'total'),
+        'pending_reviews': scalar('pending_reviews', 'count'),
+        'monthly_revenue': monthly.total if monthly else 0,
+        'falling_off_count': falling_off_count or 0,
+        'spread_falling_off': falling_off_spread or 0,
+        'client_distribution': [
+            {'account_name': account_names.get(int(row.bucket)) if row.bucket else '',
+             'contractor_count': row.count, 'total_spread': row.total}
+            for row in client_distribution
+        ]
+    }
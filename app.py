@@ -1,5 +1,6 @@
 import os
 import logging
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, current_user
@@ -31,8 +32,30 @@ def create_app():
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     
     # Upload configuration
-    app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
+    # Uploads are streamed in chunks, so the limit only bounds disk spooling
+    app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_UPLOAD_MB", 256)) * 1024 * 1024
     app.config["UPLOAD_FOLDER"] = "uploads"
+    app.config["UPLOAD_WORKERS"] = int(os.environ.get("UPLOAD_WORKERS", 1))
+    # Worker processes shared by all dry-run validations on the web; at 1 or
+    # below reports are validated in the request instead
+    app.config["VALIDATION_WORKERS"] = int(os.environ.get("VALIDATION_WORKERS", 2))
+    
+    # Analytics cache configuration
+    app.config["ANALYTICS_CACHE_TTL"] = int(os.environ.get("ANALYTICS_CACHE_TTL", 300))
+    app.config["ANALYTICS_CACHE_SIZE"] = int(os.environ.get("ANALYTICS_CACHE_SIZE", 32))
+    
+    # Per-request query budget; enforced (raising) when set, or under TESTING
+    app.config["QUERY_BUDGET"] = int(os.environ.get("QUERY_BUDGET", 20))
+    app.config["QUERY_BUDGET_ENFORCE"] = os.environ.get("QUERY_BUDGET_ENFORCE", "") == "1"
+    
+    # Log statements slower than this many milliseconds as JSON (0 disables)
+    app.config["SLOW_QUERY_MS"] = float(os.environ.get("SLOW_QUERY_MS", 0))
+    app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+    
+    # Schema setup runs once per deploy with `flask init-db`; set to 1 to also
+    # create or upgrade the schema whenever a worker starts (data backfills
+    # still only run from the command)
+    app.config["INIT_DB_ON_STARTUP"] = os.environ.get("INIT_DB_ON_STARTUP", "0") == "1"
     
     # Initialize extensions
     db.init_app(app)
@@ -43,19 +66,93 @@ def create_app():
     # Create tables
     with app.app_context():
         import models
-        db.create_all()
-        logging.info("Database tables created")
+        if app.config["INIT_DB_ON_STARTUP"] and init_database(app):
+            logging.warning("New columns were added; run `flask init-db` to backfill them")
     
-    # Template context processor for pending reviews count
+    # Template context processor for pending reviews count, read from the
+    # counter row kept by upload, delete and review actions
     @app.context_processor
     def inject_pending_reviews():
         def pending_reviews_count():
             if hasattr(current_user, 'is_authenticated') and current_user.is_authenticated:
-                from models import ReviewQueue
-                return ReviewQueue.query.filter_by(reviewed=False).count()
+                from aggregates import get_pending_reviews_count
+                return get_pending_reviews_count()
             return 0
         return dict(pending_reviews_count=pending_reviews_count)
     
+    # Background worker pool for CSV uploads
+    from jobs import JobQueue, touch_uploads
+    app.extensions['upload_jobs'] = JobQueue(max_workers=app.config["UPLOAD_WORKERS"],
+                                             heartbeat=lambda upload_ids: touch_uploads(app, upload_ids))
+    
+    # Process pool for dry-run validations, started by the first one
+    from validation import ValidationPool
+    workers = app.config["VALIDATION_WORKERS"]
+    app.extensions['validation_pool'] = ValidationPool(workers) if workers > 1 else None
+    
+    # Analytics results cache, keyed by day and data version
+    from cache import TTLCache
+    app.extensions['analytics_cache'] = TTLCache(maxsize=app.config["ANALYTICS_CACHE_SIZE"],
+                                                 ttl=app.config["ANALYTICS_CACHE_TTL"])
+    
+    # Request and SQL instrumentation, and the per-request query budget
+    from metrics import init_metrics
+    from query_budget import init_query_budget
+    init_metrics(app)
+    init_query_budget(app)
+    
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create missing tables, columns and indexes, and the search index, then backfill data."""
+        init_database(app)
+        backfill_database()
+    
+    @app.cli.command('validate-report')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--workers', type=int, default=0, help='Validation processes (0 = one per CPU).')
+    def validate_report_command(path, workers):
+        """Dry-run a spread report: list row errors and the predicted changes."""
+        from validation import ValidationPool, validate_spread_report
+        workers = workers or os.cpu_count() or 1
+        pool = ValidationPool(workers) if workers > 1 else None
+        try:
+            with open(path, 'rb') as f:
+                report = validate_spread_report(f, pool=pool)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        predicted = report['predicted']
+        click.echo(f"{report['rows']} rows in {report['elapsed_seconds']}s on {report['workers']} workers: "
+                   f"{predicted['added']} would be added, {predicted['updated']} updated, "
+                   f"{predicted['unchanged']} unchanged, {predicted['queued']} queued for review")
+        for column in report['missing_columns']:
+            click.echo(f"Missing column: {column}")
+        for error in report['errors']:
+            value = f"{error['column']} {error['value']!r}: " if error['column'] else ''
+            click.echo(f"row {error['row']}: {value}{error['message']}")
+        if report['errors_truncated']:
+            click.echo(f"... {report['error_count'] - len(report['errors'])} more errors")
+        if report['error_count']:
+            raise click.ClickException(f"{report['error_count']} problems: {report['invalid_rows']} rows with bad or "
+                                       f"missing values, {report['duplicate_talent_ids']} repeated Talent IDs")
+    
+    @app.cli.command('rebuild-aggregates')
+    def rebuild_aggregates_command():
+        """Recompute the dashboard aggregate table from the contractors."""
+        from aggregates import rebuild_dashboard_aggregates
+        rebuild_dashboard_aggregates()
+        db.session.commit()
+        logging.info("Dashboard aggregates rebuilt")
+    
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """Fail if a dashboard, analytics or review-queue query scans a table."""
+        from query_plans import check_query_plans
+        failures = check_query_plans()
+        if failures:
+            raise click.ClickException(f"Table scans in: {', '.join(failures)}")
+        logging.info("All checked hot queries are served by indexes")
+    
     # Register blueprints
     from routes import main_bp, auth_bp, contractors_bp
     app.register_blueprint(main_bp)
@@ -64,4 +161,40 @@ def create_app():
     
     return app
 
+def init_database(app):
+    """Bring the database schema up to date and return the columns added.
+    
+    Needs an application context. Data backfills are left to backfill_database.
+    """
+    from migrations import upgrade_schema
+    from search import install_search_index
+    db.create_all()
+    added_columns = upgrade_schema(db.engine, db.metadata)
+    app.config["SEARCH_BACKEND"] = install_search_index(db.engine)
+    logging.info("Database tables created")
+    
+    # Jobs whose process stopped are gone; ones still heartbeating are left running
+    from jobs import fail_interrupted_uploads
+    fail_interrupted_uploads()
+    return added_columns
+
+def backfill_database():
+    """Fill data for columns added by init_database; a no-op once done."""
+    from accounts import backfill_account_ids
+    from aggregates import rebuild_dashboard_aggregates
+    from snapshots import migrate_previous_snapshots
+    
+    # Link contractors to accounts and regroup the client buckets by id
+    accounts = backfill_account_ids()
+    if accounts:
+        rebuild_dashboard_aggregates()
+        db.session.commit()
+        logging.info(f"Linked contractors to {accounts} account names")
+    
+    # Snapshots stored by account name move onto account ids
+    snapshots = migrate_previous_snapshots()
+    if snapshots:
+        logging.info(f"Re-keyed {snapshots} account snapshots by account id")
+    db.session.commit()
+
 app = create_app()
@@ -0,0 +1,66 @@
+"""Compare per-row CSV parsing with the vectorized normalization stage.
+
+Usage: python benchmarks/bench_normalize.py [rows]
+
+Builds a synthetic spread report (500k rows by default) in memory, times
+contractor_values_from_csv over every row against normalize_spread_frame
+over the whole frame, and checks both produce the same values.
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import pandas as pd
+import app  # noqa: F401 - initializes the application before utils
+from utils import contractor_values_from_csv, normalize_spread_frame, column_arrays_to_values
+
+HEADER = ["Talent Name", "Job Title", "Candidate Status", "Talent Start Date", "Talent End Date",
+          "Mobile", "Days Since Service", "Talent ID", "Recruiter", "Peoplesoft ID",
+          "Account Manager", "PrefCentre_Aerotek_OptOut_Mobile", "Account Name", "Spread"]
+
+DATE_STYLES = ['{m}/{d}/{y}', '{y}-{m:02d}-{d:02d}', '{d:02d}-{m:02d}-{y}', '{m:02d}-{d:02d}-{y}', '']
+
+def synthetic_rows(count, seed=42):
+    rng = random.Random(seed)
+    
+    def date():
+        return rng.choice(DATE_STYLES).format(m=rng.randint(1, 12), d=rng.randint(1, 28), y=rng.randint(2020, 2027))
+    
+    rows = []
+    for i in range(count):
+        rows.append([
+            f" Talent {i} ", "Packager", rng.choice(["Current", "Current", "Inactive"]),
+            date(), date(), "604-555-0100", rng.choice([str(rng.randint(0, 900)), '', 'n/a']),
+            f"C-{i:09d}" if rng.random() > 0.01 else '', "Recruiter", f"{i:08d}",
+            "Account Manager", rng.choice(["No", "Yes", "NA"]), f"Client {i % 250} ",
+            rng.choice([f"${rng.randint(100, 5000):,}.{rng.randint(0, 99):02d}", f"{rng.uniform(50, 900):.2f}", '']),
+        ])
+    return rows
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    rows = synthetic_rows(count)
+    
+    start = time.perf_counter()
+    per_row = [contractor_values_from_csv(dict(zip(HEADER, row))) for row in rows]
+    per_row_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    frame = pd.DataFrame(rows, columns=HEADER, dtype=object)
+    vectorized = column_arrays_to_values(normalize_spread_frame(frame))
+    vectorized_seconds = time.perf_counter() - start
+    
+    mismatches = sum(1 for a, b in zip(per_row, vectorized) if a != b)
+    
+    print(f"rows:        {count}")
+    print(f"per-row:     {per_row_seconds:.2f}s ({count / per_row_seconds:,.0f} rows/sec)")
+    print(f"vectorized:  {vectorized_seconds:.2f}s ({count / vectorized_seconds:,.0f} rows/sec)")
+    print(f"speedup:     {per_row_seconds / vectorized_seconds:.1f}x")
+    print(f"mismatches:  {mismatches}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Time a cold start of the application and catch heavy imports creeping back in.
+
+Usage: python benchmarks/bench_startup.py [--repeat 5] [--init-on-startup]
+                                         [--max-import-ms MS] [--out FILE]
+
+Each run is a fresh interpreter that imports ``main`` and serves its first
+request (the login page) through the test client, against a throwaway SQLite
+file. By default INIT_DB_ON_STARTUP=0, the mode used after ``flask init-db``;
+pass --init-on-startup to include schema creation. One extra run under
+``python -X importtime`` breaks the import down by module.
+
+Exits non-zero when pandas, numpy or pyarrow are imported before the first
+request is served, or when the median import exceeds --max-import-ms, so the
+script can guard cold-start regressions. Results are written as JSON to
+benchmarks/results/ next to the run_benchmarks.py results.
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+
+# Modules only the upload and export paths need; none may load at startup
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow')
+
+# Modules listed in the import-time breakdown
+TOP_MODULES = 15
+
+# Run in each child interpreter; prints one JSON line on stdout
+CHILD_SCRIPT = f"""
+import sys, json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+response = main.app.test_client().get('/auth/login')
+served = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (served - imported) * 1000,
+    'status': response.status_code,
+    'heavy_modules': [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+def run_child(env, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', CHILD_SCRIPT]
+    child = subprocess.run(command, cwd=REPO_DIR, env=env, capture_output=True, text=True)
+    if child.returncode != 0:
+        sys.stderr.write(child.stderr)
+        sys.exit("startup run failed")
+    return json.loads(child.stdout.strip().splitlines()[-1]), child.stderr
+
+def parse_importtime(stderr):
+    """(module, self ms, cumulative ms) per line of ``-X importtime`` output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+def top_level_packages(modules):
+    """Import ms (summed self time) per top-level package, largest first."""
+    totals = {}
+    for name, self_ms, _ in modules:
+        package = name.split('.')[0]
+        totals[package] = totals.get(package, 0) + self_ms
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+def summarize(samples):
+    return {
+        'median_ms': round(statistics.median(samples), 1),
+        'min_ms': round(min(samples), 1),
+        'max_ms': round(max(samples), 1),
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='cold starts timed')
+    parser.add_argument('--init-on-startup', action='store_true', help='create the schema while starting')
+    parser.add_argument('--max-import-ms', type=float, help='fail when the median import is slower')
+    parser.add_argument('--out', help='results file (default: benchmarks/results/startup-<timestamp>.json)')
+    args = parser.parse_args()
+    
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, SESSION_SECRET='benchmark',
+                   DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+                   INIT_DB_ON_STARTUP='1' if args.init_on_startup else '0')
+        for _ in range(args.repeat):
+            runs.append(run_child(env)[0])
+        _, importtime_log = run_child(env, importtime=True)
+    
+    modules = parse_importtime(importtime_log)
+    packages = top_level_packages(modules)[:TOP_MODULES]
+    heavy = sorted({name for run in runs for name in run['heavy_modules']})
+    result = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'init_on_startup': args.init_on_startup,
+        'import': summarize([run['import_ms'] for run in runs]),
+        'first_request': summarize([run['first_request_ms'] for run in runs]),
+        'heavy_modules': heavy,
+        'packages_ms': {name: round(ms, 1) for name, ms in packages},
+    }
+    
+    print(f"import main:   {result['import']['median_ms']}ms median of {args.repeat}")
+    print(f"first request: {result['first_request']['median_ms']}ms median")
+    print("import time by package (-X importtime):")
+    for name, ms in packages:
+        print(f"  {name:<24} {ms:8.1f}ms")
+    
+    out = args.out or os.path.join(RESULTS_DIR, f"startup-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {out}")
+    
+    if heavy:
+        sys.exit(f"heavy modules imported at startup: {', '.join(heavy)}")
+    if args.max_import_ms and result['import']['median_ms'] > args.max_import_ms:
+        sys.exit(f"median import {result['import']['median_ms']}ms exceeds {args.max_import_ms}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Generate synthetic spread reports in the layout of the real export.
+
+Usage: python benchmarks/generate_spread_report.py ROWS OUT.csv [--week N] [--seed S] [--spread]
+
+Rows use the exact columns of attached_assets/Spreadreport_*.csv (pass
+--spread to append a Spread column). Each contractor's details are derived
+from its number, so reports are reproducible. Consecutive weeks slide the
+roster by CHURN_RATE: the oldest contractors drop out (and get queued for
+review on upload) while new ones join. Some carried-over contractors change
+status or end date each week. Dates come in every accepted format, and a
+few rows have no Talent ID.
+"""
+import os
+import csv
+import sys
+import random
+import argparse
+from datetime import date, timedelta
+
+HEADER = ["Talent Name", "Job Title", "Candidate Status", "Talent Start Date", "Talent End Date",
+          "Mobile", "Days Since Service", "Talent ID", "Recruiter", "Peoplesoft ID",
+          "Account Manager", "PrefCentre_Aerotek_OptOut_Mobile", "Account Name"]
+
+# Share of the roster replaced from one week to the next
+CHURN_RATE = 0.05
+
+# Share of carried-over contractors whose status or end date changes weekly
+WEEKLY_CHANGE_RATE = 0.02
+
+# Share of rows exported without a Talent ID
+MISSING_TALENT_ID_RATE = 0.01
+
+# Date renderings and how often each appears; blank dates are left empty
+DATE_STYLES = [
+    (lambda d: f"{d.month}/{d.day}/{d.year}", 80),
+    (lambda d: d.isoformat(), 8),
+    (lambda d: f"{d.day:02d}-{d.month:02d}-{d.year}", 4),
+    (lambda d: f"{d.month:02d}-{d.day:02d}-{d.year}", 4),
+    (lambda d: '', 4),
+]
+
+FIRST_NAMES = ["Josiah", "Jessamine", "Emmanuel", "Bhavitavya", "Jaspreet", "Levi", "Dharmendrakumar",
+               "Charithanga", "Qasim", "Sukhpreet", "Parampreet", "Meysam", "Avi", "Lee", "Ali Sina",
+               "Gagandeep", "Kevin", "Rajvir", "Rajwant", "Depender", "Jaskarn", "Manpreet", "Avinash",
+               "Vikash", "Sukhraj", "Akashdeep", "Yash", "Harjoban", "Bhushan", "Amirmasoud"]
+LAST_NAMES = ["Joel", "Gibson", "Sekyere", "Gupta", "Kongolo", "Patel", "Sydney", "Mohammed", "Kaler",
+              "Singh", "Motamed", "Thilakeratne", "DeHaan", "Akbari", "Kaur", "Uwayo", "Saini", "Mann",
+              "Mangat", "deep", "Hatankar", "Rafiei"]
+JOB_TITLES = ["Material Handler", "material handler", "warehouse associate", "Forklift Operator",
+              "forklift operator", "Forklfit Operator", "Shipper/Receiver", "Shipper & Receiver",
+              "skilled laborer", "Quality Control Technician", "Packager", "sheet metal worker",
+              "Warehouse Worker", "warehouse agent", "correction officer", "fork operator", "T -force"]
+RECRUITERS = ["Evan Einarson", "Leah Vincent", "Jarek Olah", "Yevgeniy Nagornyy-Kryvonos", "Jasmine Gill",
+              "Natasha Lee", "Juan Rico", "Christina Tran", "Analiese Pourseyeddahmad", ""]
+ACCOUNT_MANAGERS = ["Lucas Patriquin"] * 8 + ["Veronica Robbins", "Morgan Hale"]
+ACCOUNT_SUFFIXES = ["Inc", "Inc.", "Ltd", "Limited", "Corporation", "Ulc", "Holding B.V."]
+ACCOUNT_WORDS = ["Transport", "Quik", "Terra", "Metro", "Supply", "Chain", "Russel", "Metals", "Hilti",
+                 "Ipex", "Krown", "Produce", "Britco", "Pork", "Cozey", "White", "Cap", "Tenaquip", "Brock"]
+STATUSES = ["Current"] * 9 + ["Inactive"]
+OPT_OUT = ["No", "NA", "Yes"]
+
+# Number of distinct client accounts
+ACCOUNT_COUNT = 400
+
+def account_names():
+    rng = random.Random(ACCOUNT_COUNT)
+    return [f"{' '.join(rng.sample(ACCOUNT_WORDS, rng.randint(1, 3)))} {rng.choice(ACCOUNT_SUFFIXES)} {number}"
+            for number in range(ACCOUNT_COUNT)]
+
+ACCOUNTS = account_names()
+
+def render_date(rng, value):
+    render = rng.choices([style for style, _ in DATE_STYLES], weights=[weight for _, weight in DATE_STYLES])[0]
+    return render(value)
+
+def mobile(rng):
+    digits = f"{rng.choice(['604', '778', '236', '672', '647'])}{rng.randint(0, 9999999):07d}"
+    return rng.choice([
+        f"{digits[:3]}-{digits[3:6]}-{digits[6:]}",
+        digits,
+        f"+1 {digits[:3]} {digits[3:6]} {digits[6:]}",
+        "",
+    ])
+
+def contractor_row(number, week, today, spread):
+    """The report row for contractor ``number`` in report ``week``."""
+    rng = random.Random(number)
+    start = today - timedelta(days=rng.randint(0, 4 * 365))
+    end = start + timedelta(days=rng.randint(90, 730))
+    status = rng.choice(STATUSES)
+    
+    weekly = random.Random(-(number * 1000 + week) - 1)
+    if week and weekly.random() < WEEKLY_CHANGE_RATE:
+        # Extensions and status changes since the first report
+        end += timedelta(days=weekly.randint(7, 180))
+        status = weekly.choice(STATUSES + ["Pending", "Terminated"])
+    
+    row = [
+        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        rng.choice(JOB_TITLES),
+        status,
+        render_date(rng, start),
+        render_date(rng, end),
+        mobile(rng),
+        str(rng.randint(0, 900)),
+        f"C-{number:09d}" if rng.random() >= MISSING_TALENT_ID_RATE else "",
+        rng.choice(RECRUITERS),
+        f"{number % 10 ** 8:08d}",
+        rng.choice(ACCOUNT_MANAGERS),
+        rng.choice(OPT_OUT),
+        rng.choice(ACCOUNTS),
+    ]
+    if spread:
+        row.append(f"{rng.uniform(50, 900):.2f}")
+    return row
+
+def write_spread_report(path, rows, week=0, seed=0, spread=False, today=None):
+    """Write a ``rows``-row report for ``week``; returns the path."""
+    today = today or date.today()
+    first = seed * 10 ** 8 + week * int(rows * CHURN_RATE)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(HEADER + (["Spread"] if spread else []))
+        for number in range(first, first + rows):
+            writer.writerow(contractor_row(number, week, today, spread))
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('rows', type=int)
+    parser.add_argument('out')
+    parser.add_argument('--week', type=int, default=0, help='report week; each week churns the roster')
+    parser.add_argument('--seed', type=int, default=0, help='selects a disjoint contractor population')
+    parser.add_argument('--spread', action='store_true', help='append a Spread column')
+    args = parser.parse_args()
+    
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    write_spread_report(args.out, args.rows, week=args.week, seed=args.seed, spread=args.spread)
+    print(f"wrote {args.rows} rows to {args.out}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""Time uploads and the main pages against synthetic spread reports.
+
+Usage: python benchmarks/run_benchmarks.py [--sizes 1000 100000 1000000] [--repeat 5]
+                                           [--database-url URL] [--spread] [--out FILE]
+
+For each size a fresh database is loaded in its own process: a first report
+(all inserts), then the next week's report (updates, churn and review
+queueing), which is first dry-run validated to time the process pool
+validation and check its predicted counts against the real upload. The dashboard, analytics and contractor search pages are then
+requested through the test client with the analytics cache cleared before
+each request. Without --database-url each size uses a throwaway SQLite file;
+pass a PostgreSQL URL (e.g. a local or containerized server) to benchmark
+that instead. It must point at an empty database. Results are written as
+JSON to benchmarks/results/ so runs can be compared.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from generate_spread_report import write_spread_report
+
+# Report sizes benchmarked when --sizes is not given
+DEFAULT_SIZES = (1_000, 100_000)
+
+# Generated reports are kept here and reused across runs
+DATA_DIR = os.path.join(BENCHMARK_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+
+# Pages timed after the uploads, by name
+PAGES = {
+    'dashboard': '/dashboard',
+    'analytics': '/analytics',
+    'search': '/contractors/?search=forklift',
+    'search_short': '/contractors/?search=Ka',
+    'list_deep': None,  # filled in with a cursor from the end of the listing
+}
+
+def report_path(rows, week, spread):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"spread-{rows}-week{week}{'-spread' if spread else ''}.csv")
+    if not os.path.exists(path):
+        write_spread_report(path, rows, week=week, spread=spread)
+    return path
+
+def summarize(samples):
+    return {
+        'median_ms': round(statistics.median(samples) * 1000, 2),
+        'min_ms': round(min(samples) * 1000, 2),
+        'max_ms': round(max(samples) * 1000, 2),
+        'samples': len(samples),
+    }
+
+def run_size(rows, repeat, spread):
+    """Benchmark one report size in this process (DATABASE_URL is already set)."""
+    import logging
+    from app import app, db
+    from models import User, UploadHistory, Contractor
+    from werkzeug.datastructures import FileStorage
+    from utils import process_csv_upload
+    from validation import ValidationPool, validate_spread_report
+    from pagination import encode_cursor
+    logging.getLogger().setLevel(logging.WARNING)
+    
+    app.config['WTF_CSRF_ENABLED'] = False
+    results = {'rows': rows, 'dialect': None, 'uploads': {}, 'dry_run': None, 'pages': {}}
+    
+    with app.app_context():
+        results['dialect'] = db.engine.dialect.name
+        user = User(email='bench@example.com', first_name='Bench', onboarding_completed=True)
+        user.set_password('benchmark')
+        db.session.add(user)
+        db.session.commit()
+        
+        for label, week in (('initial', 0), ('next_week', 1)):
+            path = report_path(rows, week, spread)
+            if label == 'next_week':
+                workers = os.cpu_count() or 1
+                pool = ValidationPool(workers) if workers > 1 else None
+                try:
+                    with open(path, 'rb') as f:
+                        report = validate_spread_report(f, pool=pool)
+                finally:
+                    if pool is not None:
+                        pool.shutdown()
+                results['dry_run'] = {
+                    'seconds': report['elapsed_seconds'],
+                    'rows_per_second': round(rows / report['elapsed_seconds']),
+                    'workers': report['workers'],
+                    'predicted': report['predicted'],
+                }
+            
+            start = time.perf_counter()
+            with open(path, 'rb') as f:
+                stats = process_csv_upload(FileStorage(f, filename=os.path.basename(path)), user.id)
+            seconds = time.perf_counter() - start
+            upload = UploadHistory.query.order_by(UploadHistory.id.desc()).first()
+            results['uploads'][label] = {
+                'seconds': round(seconds, 3),
+                'rows_per_second': round(rows / seconds),
+                'stats': stats,
+                'stages': upload.stage_timings,
+            }
+        
+        predicted = results['dry_run']['predicted']
+        results['dry_run']['matches_upload'] = all(predicted[key] == stats[key] for key in predicted)
+        
+        oldest = Contractor.query.order_by(Contractor.created_at, Contractor.id).first()
+        PAGES['list_deep'] = f"/contractors/?cursor={encode_cursor(oldest, 'prev')}"
+        db.session.remove()
+    
+    client = app.test_client()
+    client.post('/auth/login', data={'email': 'bench@example.com', 'password': 'benchmark'})
+    cache = app.extensions['analytics_cache']
+    for name, url in PAGES.items():
+        samples = []
+        for _ in range(repeat):
+            cache.clear()
+            start = time.perf_counter()
+            response = client.get(url)
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == 200, f"{url} returned {response.status_code}"
+        results['pages'][name] = {**summarize(samples), 'queries': int(response.headers['X-Query-Count'])}
+    
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=5, help='requests per page')
+    parser.add_argument('--database-url', help='benchmark this database instead of throwaway SQLite files')
+    parser.add_argument('--spread', action='store_true', help='include a Spread column in the reports')
+    parser.add_argument('--out', help='results file (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--single', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.single:
+        # Child process: one size against the DATABASE_URL it was given
+        print(json.dumps(run_size(args.single, args.repeat, args.spread)))
+        return
+    
+    runs = []
+    for rows in args.sizes:
+        report_path(rows, 0, args.spread)
+        report_path(rows, 1, args.spread)
+        
+        with tempfile.TemporaryDirectory() as workdir:
+            # Each size gets a fresh database, so the schema is created as the app starts
+            env = dict(os.environ, SESSION_SECRET='benchmark', INIT_DB_ON_STARTUP='1',
+                       DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+            command = [sys.executable, os.path.abspath(__file__), '--single', str(rows), '--repeat', str(args.repeat)]
+            if args.spread:
+                command.append('--spread')
+            child = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+        
+        if child.returncode != 0:
+            sys.stderr.write(child.stderr)
+            sys.exit(f"benchmark for {rows} rows failed")
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        runs.append(result)
+        
+        uploads = ', '.join(f"{label} {upload['seconds']}s" for label, upload in result['uploads'].items())
+        dry_run = result['dry_run']
+        uploads += (f", dry run {dry_run['seconds']}s on {dry_run['workers']} workers"
+                    f"{'' if dry_run['matches_upload'] else ' (prediction differs)'}")
+        pages = ', '.join(f"{name} {page['median_ms']}ms" for name, page in result['pages'].items())
+        print(f"{rows:>9} rows: {uploads}; {pages}")
+    
+    output = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'spread_column': args.spread,
+        'runs': runs,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"results written to {out}")
+
+if __name__ == '__main__':
+    main()
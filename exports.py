@@ -0,0 +1,96 @@
+import io
+import csv
+import tempfile
+from decimal import Decimal
+from sqlalchemy import Integer, Float, Numeric, Date, DateTime, Boolean
+from app import db
+
+# Rows fetched from the server-side cursor (and written to Parquet) at a time
+EXPORT_BATCH_SIZE = 2000
+
+# Parquet exports stay in memory up to this size, then spill to a temp file
+PARQUET_SPOOL_BYTES = 16 * 1024 * 1024
+
+# Contractor fields included in contractor exports, in column order
+CONTRACTOR_EXPORT_COLUMNS = (
+    'id', 'talent_id', 'talent_name', 'job_title', 'candidate_status', 'talent_start_date',
+    'talent_end_date', 'mobile', 'recruiter', 'peoplesoft_id', 'account_manager', 'account_name',
+    'spread_amount', 'days_since_service', 'opt_out_mobile', 'created_at', 'updated_at',
+)
+
+class ExportUnavailable(Exception):
+    """The requested export format cannot be produced on this installation."""
+
+def query_columns(query):
+    """(name, SQLAlchemy type) for each column a query returns."""
+    return [(column['name'], column['type']) for column in query.column_descriptions]
+
+def iter_row_batches(query, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of row tuples, streaming the query with a server-side cursor."""
+    result = db.session.execute(query.statement.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+def csv_chunks(columns, batches):
+    """Render batches of rows as CSV text, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    yield buffer.getvalue()
+    
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+def import_pyarrow():
+    """Import pyarrow on first use; it is optional and slow to import."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportUnavailable('Parquet export requires pyarrow')
+    return pa, pq
+
+def arrow_type(sql_type):
+    pa, _ = import_pyarrow()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(sql_type, Date):
+        return pa.date32()
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, Numeric):
+        return pa.decimal128(18, sql_type.scale if sql_type.scale is not None else 2)
+    return pa.string()
+
+def arrow_column(values, field):
+    pa, _ = import_pyarrow()
+    if pa.types.is_decimal(field.type):
+        quantum = Decimal(1).scaleb(-field.type.scale)
+        values = [None if value is None else Decimal(value).quantize(quantum) for value in values]
+    elif pa.types.is_string(field.type):
+        values = [None if value is None else str(value) for value in values]
+    return pa.array(values, type=field.type)
+
+def parquet_file(columns, batches):
+    """Write batches of rows to a Parquet file, one row group per batch.
+    
+    Returns the file positioned at the start. Raises ExportUnavailable when
+    pyarrow is not installed.
+    """
+    pa, pq = import_pyarrow()
+    schema = pa.schema([(name, arrow_type(sql_type)) for name, sql_type in columns])
+    output = tempfile.SpooledTemporaryFile(max_size=PARQUET_SPOOL_BYTES)
+    writer = pq.ParquetWriter(output, schema)
+    for batch in batches:
+        arrays = [arrow_column(values, field) for values, field in zip(zip(*batch), schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+    writer.close()
+    output.seek(0)
+    return output
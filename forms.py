@@ -57,3 +57,6 @@ class UploadForm(FlaskForm):
         FileAllowed(['csv'], 'CSV files only!')
     ])
     description = TextAreaField('Description (Optional)', validators=[Optional()])
+    profile = BooleanField('Capture a profile of this upload')
+    force = BooleanField('Process again even if this file was just uploaded')
+    dry_run = BooleanField('Validate only: report errors and predicted changes without saving')
@@ -0,0 +1,222 @@
+import os
+import uuid
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import select, update, delete, func
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+from app import db
+from models import UploadHistory, UploadStaging
+from utils import process_csv_upload
+
+# Bytes copied (and hashed) at a time while spooling an upload to disk
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+# Seconds between heartbeats for the jobs a queue holds
+HEARTBEAT_INTERVAL = 30
+
+# Uploads whose worker has not been heard from for this long are taken to be dead
+UPLOAD_STALE_AFTER = timedelta(minutes=5)
+
+class JobQueue:
+    """Run jobs on a local thread pool and keep an in-process status store.
+    
+    Jobs are keyed by a caller-supplied id. Each job's state moves from
+    'queued' to 'running' and ends as 'completed' or 'failed'. Finished jobs
+    are dropped from the store; their outcome lives in UploadHistory. When
+    ``heartbeat`` is given it is called with the ids of the jobs held, queued
+    or running, every ``heartbeat_interval`` seconds.
+    """
+    
+    def __init__(self, max_workers=1, heartbeat=None, heartbeat_interval=HEARTBEAT_INTERVAL):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload-job')
+        self._jobs = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._heartbeat = heartbeat
+        self._heartbeat_interval = heartbeat_interval
+        self._heartbeat_thread = None
+        self._stopped = threading.Event()
+    
+    def submit(self, job_id, func, *args, **kwargs):
+        """Queue ``func(*args, **kwargs)`` under ``job_id``."""
+        with self._lock:
+            self._jobs[job_id] = {
+                'state': 'queued',
+                'submitted_at': datetime.utcnow(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None
+            }
+            future = self._executor.submit(self._run, job_id, func, args, kwargs)
+            self._futures[job_id] = future
+            if self._heartbeat is not None and self._heartbeat_thread is None:
+                self._heartbeat_thread = threading.Thread(target=self._beat, name='upload-job-heartbeat', daemon=True)
+                self._heartbeat_thread.start()
+        future.add_done_callback(lambda _: self._forget(job_id))
+        return job_id
+    
+    def _beat(self):
+        while not self._stopped.wait(self._heartbeat_interval):
+            with self._lock:
+                job_ids = list(self._jobs)
+            if not job_ids:
+                continue
+            try:
+                self._heartbeat(job_ids)
+            except Exception:
+                logging.exception("Job heartbeat failed")
+    
+    def _run(self, job_id, func, args, kwargs):
+        self._update(job_id, state='running', started_at=datetime.utcnow())
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            logging.exception(f"Job {job_id} failed")
+            self._update(job_id, state='failed', error=str(e), finished_at=datetime.utcnow())
+            raise
+        self._update(job_id, state='completed', finished_at=datetime.utcnow())
+        return result
+    
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+    
+    def _forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._futures.pop(job_id, None)
+    
+    def get(self, job_id):
+        """Return a snapshot of a job's status, or None if it is unknown or finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+    
+    def wait(self, job_id, timeout=None):
+        """Block until a job finishes and return its result (None if it already had)."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        return future.result(timeout=timeout) if future else None
+    
+    def shutdown(self, wait=True):
+        self._stopped.set()
+        self._executor.shutdown(wait=wait)
+
+def touch_uploads(app, upload_ids):
+    """Record that the uploads with ``upload_ids`` are still held by a live worker."""
+    with app.app_context():
+        try:
+            db.session.execute(
+                update(UploadHistory)
+                .where(UploadHistory.id.in_(upload_ids), UploadHistory.status.in_(['queued', 'processing']))
+                .values(heartbeat_at=datetime.utcnow()),
+                execution_options={'synchronize_session': False}
+            )
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+def fail_interrupted_uploads(stale_after=UPLOAD_STALE_AFTER):
+    """Mark queued or processing uploads whose worker has gone quiet as failed.
+    
+    Their jobs died with the process that held them, so without this they
+    would stay live forever and block re-uploads as duplicates. Uploads
+    still heartbeating, on this or another instance, are left alone. The
+    staged talent IDs of every upload that is no longer live are dropped.
+    """
+    cutoff = datetime.utcnow() - stale_after
+    live = UploadHistory.status.in_(['queued', 'processing'])
+    interrupted = db.session.execute(
+        update(UploadHistory)
+        .where(live, func.coalesce(UploadHistory.heartbeat_at, UploadHistory.uploaded_at) < cutoff)
+        .values(status='failed', error_message='Stopped responding before it finished; its worker was probably restarted',
+                completed_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    db.session.execute(
+        delete(UploadStaging).where(UploadStaging.upload_id.not_in(select(UploadHistory.id).where(live))),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    if interrupted:
+        logging.warning(f"Marked {interrupted} interrupted uploads as failed")
+    return interrupted
+
+def spool_upload(file, path):
+    """Copy an uploaded file to ``path`` and return its SHA-256 hex digest.
+    
+    The digest is computed block by block during the copy, so fingerprinting
+    costs no extra pass over the file and memory stays flat.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'wb') as out:
+        for block in iter(lambda: file.stream.read(SPOOL_BLOCK_SIZE), b''):
+            digest.update(block)
+            out.write(block)
+    return digest.hexdigest()
+
+def find_duplicate_upload(fingerprint):
+    """Return the latest upload that did not fail if it was of the same file.
+    
+    Only the latest one counts: re-uploading an older report after a newer
+    one is a real change and has to be processed.
+    """
+    latest = UploadHistory.query.filter(UploadHistory.status != 'failed')\
+        .order_by(UploadHistory.uploaded_at.desc(), UploadHistory.id.desc()).first()
+    if latest is not None and latest.file_fingerprint == fingerprint:
+        return latest
+    return None
+
+def enqueue_csv_upload(file, user_id, profile=False, force=False):
+    """Spool an uploaded CSV to disk and queue it for background processing.
+    
+    Returns ``(upload_id, duplicate)``. The id is that of the UploadHistory
+    record, which doubles as the job id. When the file is identical to the
+    latest upload and ``force`` is not set, nothing is queued and the earlier
+    upload's id is returned with ``duplicate`` True.
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+    filename = secure_filename(file.filename)
+    path = os.path.join(upload_folder, f"{uuid.uuid4().hex}.csv")
+    fingerprint = spool_upload(file, path)
+    
+    if not force:
+        # An upload whose worker died must not count as the latest one
+        fail_interrupted_uploads()
+        duplicate = find_duplicate_upload(fingerprint)
+        if duplicate is not None:
+            os.remove(path)
+            logging.info(f"Upload {filename} matches upload {duplicate.id}; not reprocessing")
+            return duplicate.id, True
+    
+    upload_record = UploadHistory(
+        filename=filename,
+        uploaded_by=user_id,
+        status='queued',
+        file_fingerprint=fingerprint,
+        heartbeat_at=datetime.utcnow()
+    )
+    db.session.add(upload_record)
+    db.session.commit()
+    
+    jobs = current_app.extensions['upload_jobs']
+    jobs.submit(upload_record.id, run_csv_upload_job,
+                current_app._get_current_object(), path, filename, user_id, upload_record.id, profile)
+    return upload_record.id, False
+
+def run_csv_upload_job(app, path, filename, user_id, upload_id, profile=False):
+    """Process a spooled CSV upload inside its own application context."""
+    with app.app_context():
+        try:
+            with open(path, 'rb') as f:
+                return process_csv_upload(FileStorage(f, filename=filename), user_id,
+                                          upload_id=upload_id, profile=profile)
+        finally:
+            db.session.remove()
+            os.remove(path)
@@ -0,0 +1,169 @@
+import json
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from flask import g, request, current_app, has_app_context, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# How many of the slowest statements are kept for /metrics
+SLOWEST_STATEMENTS = 10
+
+# Longest statement text kept for /metrics and the slow-query log
+STATEMENT_PREVIEW_LENGTH = 200
+
+slow_query_log = logging.getLogger('slow_query')
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels) + '}'
+
+class MetricsRegistry:
+    """In-process request and SQL counters rendered in Prometheus text format.
+    
+    Counters are per worker process, like the analytics cache; scrape each
+    worker or aggregate them in Prometheus.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.latency_buckets = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+        self.latency_sum = defaultdict(float)
+        self.queries = defaultdict(int)
+        self.sql_seconds = defaultdict(float)
+        self.slowest = []
+    
+    def record_request(self, endpoint, method, status, seconds):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            self.latency_buckets[endpoint][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.latency_sum[endpoint] += seconds
+    
+    def record_query(self, endpoint, statement, seconds):
+        with self._lock:
+            self.queries[endpoint] += 1
+            self.sql_seconds[endpoint] += seconds
+            if len(self.slowest) < SLOWEST_STATEMENTS or seconds > self.slowest[-1][0]:
+                self.slowest.append((seconds, endpoint, statement[:STATEMENT_PREVIEW_LENGTH]))
+                self.slowest.sort(key=lambda entry: entry[0], reverse=True)
+                del self.slowest[SLOWEST_STATEMENTS:]
+    
+    def render(self, extra=()):
+        """Render every metric, plus ``(name, help, type, [(labels, value)])`` extras."""
+        with self._lock:
+            families = [
+                ('http_requests_total', 'HTTP requests handled.', 'counter',
+                 [((('endpoint', e), ('method', m), ('status', s)), n)
+                  for (e, m, s), n in sorted(self.requests.items())]),
+                ('sql_queries_total', 'SQL statements executed.', 'counter',
+                 [((('endpoint', e),), n) for e, n in sorted(self.queries.items())]),
+                ('sql_query_seconds_total', 'Time spent executing SQL statements.', 'counter',
+                 [((('endpoint', e),), s) for e, s in sorted(self.sql_seconds.items())]),
+                ('sql_slowest_query_seconds', 'Slowest SQL statements seen since start.', 'gauge',
+                 [((('endpoint', e), ('statement', stmt)), s) for s, e, stmt in self.slowest]),
+            ]
+            
+            histogram = []
+            for endpoint, counts in sorted(self.latency_buckets.items()):
+                cumulative = 0
+                for bound, count in zip((*LATENCY_BUCKETS, '+Inf'), counts):
+                    cumulative += count
+                    histogram.append(('_bucket', (('endpoint', endpoint), ('le', bound)), cumulative))
+                histogram.append(('_sum', (('endpoint', endpoint),), self.latency_sum[endpoint]))
+                histogram.append(('_count', (('endpoint', endpoint),), cumulative))
+        
+        lines = []
+        for name, help_text, metric_type, samples in [*families, *extra]:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            lines.extend(f'{name}{format_labels(labels)} {value}' for labels, value in samples)
+        
+        lines.append('# HELP http_request_duration_seconds Request handler latency.')
+        lines.append('# TYPE http_request_duration_seconds histogram')
+        lines.extend(f'http_request_duration_seconds{suffix}{format_labels(labels)} {value}'
+                     for suffix, labels, value in histogram)
+        return '\n'.join(lines) + '\n'
+
+def current_endpoint():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return 'background'
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'handle_error')
+def drop_query_timer(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_start'):
+        conn.info['query_start'].pop()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_start'].pop()
+    registry = current_app.extensions.get('metrics') if has_app_context() else None
+    if registry is None:
+        return
+    endpoint = current_endpoint()
+    registry.record_query(endpoint, statement, seconds)
+    
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+        g.sql_seconds = g.get('sql_seconds', 0.0) + seconds
+    
+    slow_query_ms = current_app.config['SLOW_QUERY_MS']
+    if slow_query_ms and seconds * 1000 >= slow_query_ms:
+        slow_query_log.warning(json.dumps({
+            'event': 'slow_query',
+            'endpoint': endpoint,
+            'duration_ms': round(seconds * 1000, 3),
+            'executemany': executemany,
+            'statement': statement[:STATEMENT_PREVIEW_LENGTH]
+        }))
+
+def init_metrics(app):
+    """Time SQL statements and requests into a registry kept on the app.
+    
+    Each request's query count, SQL time and handler latency are recorded
+    per endpoint. Statements slower than SLOW_QUERY_MS (when set) are logged
+    as JSON on the 'slow_query' logger. The engine listeners above are
+    registered once per process and report to the app in context.
+    """
+    registry = MetricsRegistry()
+    app.extensions['metrics'] = registry
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+    
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            seconds = time.perf_counter() - start
+            registry.record_request(request.endpoint or 'unmatched', request.method,
+                                    response.status_code, seconds)
+            response.headers['Server-Timing'] = (
+                f"sql;dur={g.get('sql_seconds', 0.0) * 1000:.1f}, app;dur={seconds * 1000:.1f}"
+            )
+        return response
+    
+    @app.teardown_request
+    def record_failed_request(exception):
+        # after_request is skipped when the handler raises
+        start = g.pop('request_start', None)
+        if start is not None:
+            registry.record_request(request.endpoint or 'unmatched', request.method,
+                                    500, time.perf_counter() - start)
@@ -0,0 +1,90 @@
+import logging
+from sqlalchemy import inspect, text
+
+# Indexes earlier versions created that no query uses any more, by table
+RETIRED_INDEXES = {
+    # Client breakdowns group by account_id since accounts got their own table
+    'contractors': ('ix_contractors_account_name',),
+}
+
+def previous_table_name(name):
+    """Where upgrade_schema moves a table whose primary key changed."""
+    return f'{name}_previous'
+
+def upgrade_schema(engine, metadata):
+    """Bring tables created by older versions up to date with the models.
+    
+    ``db.create_all()`` only creates missing tables, so columns added to an
+    existing model afterwards are added here with ``ALTER TABLE``, new
+    indexes are created (then the table re-analyzed so the planner uses them)
+    and retired ones dropped. A table whose primary key changed is renamed
+    with previous_table_name and created afresh, for a data migration to refill.
+    Returns the (table, column) names added, for data migrations that follow.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = engine.dialect.identifier_preparer
+    added = []
+    
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            primary_key = inspector.get_pk_constraint(table.name)
+            if set(primary_key['constrained_columns']) != {column.name for column in table.primary_key}:
+                # Primary keys cannot be altered in place; index names must be free for the new table
+                previous = previous_table_name(table.name)
+                for index in inspector.get_indexes(table.name):
+                    conn.execute(text(f'DROP INDEX {preparer.quote(index["name"])}'))
+                conn.execute(text(f'ALTER TABLE {preparer.format_table(table)} RENAME TO {preparer.quote(previous)}'))
+                if primary_key['name'] and engine.dialect.name == 'postgresql':
+                    conn.execute(text(
+                        f'ALTER TABLE {preparer.quote(previous)} RENAME CONSTRAINT '
+                        f'{preparer.quote(primary_key["name"])} TO {preparer.quote(previous + "_pkey")}'
+                    ))
+                table.create(conn)
+                added.extend((table.name, column.name) for column in table.columns if column.name not in existing_columns)
+                logging.info(f"Moved {table.name} to {previous}; its primary key changed")
+                continue
+            
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f'ALTER TABLE {preparer.format_table(table)} '
+                    f'ADD COLUMN {preparer.format_column(column)} {column_type}'
+                ))
+                added.append((table.name, column.name))
+                logging.info(f"Added column {table.name}.{column.name}")
+            
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for name in RETIRED_INDEXES.get(table.name, ()):
+                if name in existing_indexes:
+                    conn.execute(text(f'DROP INDEX {preparer.quote(name)}'))
+                    logging.info(f"Dropped index {name}")
+            
+            missing_indexes = [index for index in table.indexes if index.name not in existing_indexes]
+            for index in missing_indexes:
+                index.create(conn)
+                logging.info(f"Created index {index.name}")
+            
+            if missing_indexes:
+                # Refresh planner statistics so the new (partial) indexes get picked
+                analyze_tables(conn, [table])
+    return added
+
+def analyze_tables(conn, tables):
+    """Refresh the planner statistics of ``tables`` where the backend keeps them.
+    
+    Without statistics SQLite cannot tell that a partial index on active
+    contractors is selective and falls back to the status index plus a sort.
+    """
+    if conn.dialect.name not in ('postgresql', 'sqlite'):
+        return
+    preparer = conn.dialect.identifier_preparer
+    for table in tables:
+        conn.execute(text(f'ANALYZE {preparer.format_table(table)}'))
@@ -2,7 +2,7 @@ from datetime import datetime, date
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Numeric
+from sqlalchemy import Numeric, text
 from app import db
 
 class User(UserMixin, db.Model):
@@ -31,6 +31,18 @@ class User(UserMixin, db.Model):
     def display_name(self):
         return self.first_name if self.first_name else self.email.split('@')[0]
 
+class Account(db.Model):
+    """Client accounts, one per normalized name, referenced by contractors."""
+    __tablename__ = 'accounts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(200), unique=True, nullable=False)  # Case, punctuation and spacing folded; see accounts.account_key
+    name = db.Column(db.String(200), nullable=False)  # First spelling seen, used for display
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Account {self.name}>'
+
 class Contractor(db.Model):
     __tablename__ = 'contractors'
     
@@ -45,10 +57,12 @@ class Contractor(db.Model):
     recruiter = db.Column(db.String(100))
     peoplesoft_id = db.Column(db.String(50))
     account_manager = db.Column(db.String(100))
-    account_name = db.Column(db.String(200))
+    account_name = db.Column(db.String(200))  # As reported; grouping uses account_id
+    account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'))
     spread_amount = db.Column(Numeric(10, 2))
     days_since_service = db.Column(db.Integer)
     opt_out_mobile = db.Column(db.String(10), default='No')
+    row_hash = db.Column(db.String(32))  # Digest of the report values last written by an upload
     
     # Tracking fields
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -57,6 +71,26 @@ class Contractor(db.Model):
     
     # Relationships
     creator = db.relationship('User', backref='contractors_created')
+    account = db.relationship('Account')
+    
+    __table_args__ = (
+        # Keyset pagination of the contractor list, unfiltered and by status
+        db.Index('ix_contractors_created_at_id', 'created_at', 'id'),
+        db.Index('ix_contractors_status_created_at_id', 'candidate_status', 'created_at', 'id'),
+        # Dashboard top spreads and quarterly roll-off; only active contractors
+        # are ever read this way, so the index is partial where supported
+        db.Index('ix_contractors_current_spread', 'spread_amount',
+                 postgresql_where=text("candidate_status = 'Current'"),
+                 sqlite_where=text("candidate_status = 'Current'")),
+        db.Index('ix_contractors_current_end_date', 'talent_end_date', 'id',
+                 postgresql_where=text("candidate_status = 'Current'"),
+                 sqlite_where=text("candidate_status = 'Current'")),
+        # Roll-off totals sum every active contractor's spread; led by status
+        # and covering the summed columns, they never read the table
+        db.Index('ix_contractors_status_end_date_spread', 'candidate_status', 'talent_end_date', 'spread_amount'),
+        # Client breakdowns group by account
+        db.Index('ix_contractors_account_id', 'account_id'),
+    )
     
     def __repr__(self):
         return f'<Contractor {self.talent_name}>'
@@ -76,6 +110,7 @@ class ReviewQueue(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     contractor_id = db.Column(db.Integer, db.ForeignKey('contractors.id'), nullable=False)
+    upload_id = db.Column(db.Integer, db.ForeignKey('upload_history.id'))  # Upload that queued the item, if any
     reason = db.Column(db.String(200))
     added_at = db.Column(db.DateTime, default=datetime.utcnow)
     added_by = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -89,8 +124,19 @@ class ReviewQueue(db.Model):
     added_by_user = db.relationship('User', foreign_keys=[added_by], backref='review_items_added')
     reviewed_by_user = db.relationship('User', foreign_keys=[reviewed_by], backref='review_items_reviewed')
     
+    __table_args__ = (
+        # Open review items, newest first, and the pending badge count
+        db.Index('ix_review_queue_pending_added_at', 'added_at',
+                 postgresql_where=text('reviewed = false'),
+                 sqlite_where=text('reviewed = 0')),
+        # "Already queued" anti-join when an upload queues missing contractors
+        db.Index('ix_review_queue_contractor_reviewed', 'contractor_id', 'reviewed'),
+        # Bulk actions on everything one upload queued
+        db.Index('ix_review_queue_upload_id', 'upload_id'),
+    )
+    
     def __repr__(self):
-        return f'<ReviewQueue {self.contractor.talent_name}>'
+        return f'<ReviewQueue contractor={self.contractor_id}>'
 
 class UploadHistory(db.Model):
     __tablename__ = 'upload_history'
@@ -102,12 +148,94 @@ class UploadHistory(db.Model):
     records_processed = db.Column(db.Integer)
     records_added = db.Column(db.Integer)
     records_updated = db.Column(db.Integer)
+    records_unchanged = db.Column(db.Integer)
     records_queued_for_review = db.Column(db.Integer)
-    status = db.Column(db.String(50), default='completed')
+    chunks_processed = db.Column(db.Integer, default=0)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    status = db.Column(db.String(50), default='completed')  # 'queued', 'processing', 'completed', 'failed'
     error_message = db.Column(db.Text)
+    stage_timings = db.Column(db.JSON)  # Seconds per pipeline stage, in execution order
+    profile_report = db.Column(db.Text)  # cProfile listing, for uploads run with profiling
+    file_fingerprint = db.Column(db.String(64))  # SHA-256 of the uploaded file, taken while spooling it
+    heartbeat_at = db.Column(db.DateTime)  # Last sign of life from the worker holding a queued or running upload
     
     # Relationships
     uploader = db.relationship('User', backref='uploads')
     
+    __table_args__ = (
+        db.Index('ix_upload_history_uploaded_at', 'uploaded_at'),
+    )
+    
     def __repr__(self):
         return f'<UploadHistory {self.filename}>'
+    
+    @property
+    def elapsed_seconds(self):
+        if not self.started_at:
+            return None
+        return ((self.completed_at or datetime.utcnow()) - self.started_at).total_seconds()
+    
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed_seconds
+        if not elapsed or not self.records_processed:
+            return None
+        return self.records_processed / elapsed
+    
+    @property
+    def stage_breakdown(self):
+        """Per-stage seconds, share of the total and rows/sec, in execution order."""
+        timings = self.stage_timings or {}
+        total = sum(timings.values())
+        return [{
+            'stage': stage,
+            'seconds': seconds,
+            'share': seconds / total if total else None,
+            'rows_per_second': self.records_processed / seconds if seconds and self.records_processed else None
+        } for stage, seconds in timings.items()]
+
+class UploadStaging(db.Model):
+    """Talent IDs seen by an in-flight upload, cleared when it finishes."""
+    __tablename__ = 'upload_staging'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    upload_id = db.Column(db.Integer, db.ForeignKey('upload_history.id'), nullable=False)
+    talent_id = db.Column(db.String(50), nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_upload_staging_upload_talent', 'upload_id', 'talent_id'),
+    )
+
+class DashboardAggregate(db.Model):
+    """Precomputed dashboard counters, kept current by incremental deltas."""
+    __tablename__ = 'dashboard_aggregates'
+    
+    # metric: 'contractors', 'active', 'pending_reviews', 'client', 'end_date', 'created_month', 'data_version'
+    metric = db.Column(db.String(50), primary_key=True)
+    bucket = db.Column(db.String(200), primary_key=True, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(Numeric(14, 2), nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DashboardAggregate {self.metric}:{self.bucket}>'
+
+class AccountSnapshot(db.Model):
+    """Per-account contractor totals as they stood after each upload."""
+    __tablename__ = 'account_snapshots'
+    
+    # The primary key serves trend range scans over recent uploads
+    upload_id = db.Column(db.Integer, db.ForeignKey('upload_history.id'), primary_key=True)
+    account_id = db.Column(db.Integer, primary_key=True, default=0)  # 0 for contractors without an account
+    contractor_count = db.Column(db.Integer, nullable=False, default=0)
+    active_count = db.Column(db.Integer, nullable=False, default=0)
+    total_spread = db.Column(Numeric(14, 2), nullable=False, default=0)
+    active_spread = db.Column(Numeric(14, 2), nullable=False, default=0)
+    
+    __table_args__ = (
+        # Trend series for a single account
+        db.Index('ix_account_snapshots_account_upload', 'account_id', 'upload_id'),
+    )
+    
+    def __repr__(self):
+        return f'<AccountSnapshot {self.upload_id}:{self.account_id}>'
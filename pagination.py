@@ -0,0 +1,72 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+from models import Contractor
+
+class KeysetPage:
+    """One page of a (created_at, id) keyset listing.
+    
+    ``next_cursor``/``prev_cursor`` are opaque tokens for the neighbouring
+    pages; ``total`` is a cached count and may lag recent changes slightly.
+    """
+    
+    def __init__(self, items, next_cursor, prev_cursor, total):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+    
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def encode_cursor(contractor, direction):
+    """Build an opaque token pointing just past ``contractor``."""
+    payload = [direction, contractor.created_at.isoformat(), contractor.id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Return ``(direction, created_at, id)`` for a token, or None if it is invalid."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, created_at, contractor_id = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, datetime.fromisoformat(created_at), int(contractor_id)
+    except (ValueError, TypeError):
+        return None
+
+def keyset_paginate(query, cursor=None, per_page=20, total=None):
+    """Page an unordered Contractor query newest first without OFFSET.
+    
+    The page boundary is a (created_at, id) row comparison, which the
+    composite created_at/id indexes serve directly, so a deep page costs
+    the same as the first one.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    key = tuple_(Contractor.created_at, Contractor.id)
+    
+    if position and position[0] == 'prev':
+        rows = query.filter(key > tuple_(position[1], position[2]))\
+            .order_by(Contractor.created_at.asc(), Contractor.id.asc())\
+            .limit(per_page + 1).all()
+        has_more_before = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_more_after = True
+    else:
+        if position:
+            query = query.filter(key < tuple_(position[1], position[2]))
+        rows = query.order_by(Contractor.created_at.desc(), Contractor.id.desc())\
+            .limit(per_page + 1).all()
+        has_more_after = len(rows) > per_page
+        items = rows[:per_page]
+        has_more_before = position is not None
+    
+    next_cursor = encode_cursor(items[-1], 'next') if items and has_more_after else None
+    prev_cursor = encode_cursor(items[0], 'prev') if items and has_more_before else None
+    return KeysetPage(items, next_cursor, prev_cursor, total)
@@ -0,0 +1,58 @@
+import io
+import time
+import cProfile
+import pstats
+from contextlib import contextmanager
+
+# Functions listed in a captured upload profile, by cumulative time
+PROFILE_TOP_FUNCTIONS = 40
+
+class StageTimer:
+    """Accumulates wall-clock seconds per named pipeline stage."""
+    
+    def __init__(self):
+        self.seconds = {}
+    
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+    
+    def iterate(self, name, iterable):
+        """Yield from ``iterable``, charging the time spent producing items to ``name``."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    
+    def as_dict(self):
+        return {name: round(seconds, 4) for name, seconds in self.seconds.items()}
+
+@contextmanager
+def capture_profile(enabled):
+    """Run the block under cProfile when ``enabled``.
+    
+    Yields a dict whose 'report' key holds the pstats listing (top functions
+    by cumulative time) once the block exits.
+    """
+    result = {'report': None}
+    if not enabled:
+        yield result
+        return
+    
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        result['report'] = output.getvalue()
@@ -0,0 +1,36 @@
+import logging
+from flask import g, request
+
+# Most queries a page may run; pages not listed use QUERY_BUDGET
+ENDPOINT_QUERY_BUDGETS = {
+    'main.dashboard': 14,
+    'main.dashboard_api': 14,
+    'main.review_queue': 6,
+    'contractors.list_contractors': 7,
+    'contractors.view_contractor': 5,
+}
+
+class QueryBudgetExceeded(RuntimeError):
+    """A request ran more queries than its page is allowed."""
+
+def init_query_budget(app):
+    """Check the queries each request runs against a budget.
+    
+    Queries are counted by the engine listeners set up in metrics.py. The
+    count is sent back in an X-Query-Count header. When QUERY_BUDGET_ENFORCE
+    is set (always under TESTING) a page going over its budget raises
+    QueryBudgetExceeded, so N+1 regressions fail loudly; otherwise it is
+    logged as a warning.
+    """
+    @app.after_request
+    def check_query_budget(response):
+        count = g.get('query_count', 0)
+        response.headers['X-Query-Count'] = str(count)
+        
+        budget = ENDPOINT_QUERY_BUDGETS.get(request.endpoint, app.config['QUERY_BUDGET'])
+        if count > budget:
+            message = f"{request.endpoint} ran {count} queries (budget {budget})"
+            if app.config['QUERY_BUDGET_ENFORCE'] or app.testing:
+                raise QueryBudgetExceeded(message)
+            logging.warning(message)
+        return response
@@ -0,0 +1,104 @@
+import json
+import logging
+from datetime import date
+from app import db
+from reports import quarter_periods, rolloff_totals_query, rolloff_query, client_stats_query, ROLLOFF_PAGE_SIZE
+from snapshots import spread_trend_query, DEFAULT_TREND_UPLOADS
+
+# Tables that must never be read with a full scan on a hot path
+WATCHED_TABLES = ('contractors', 'review_queue', 'upload_history', 'account_snapshots')
+
+# Whole-index walks that are fine, by query: each stops after a few entries
+# or reads only rows the page shows. Any other walk fails the check.
+INDEX_WALKS = {
+    # Newest first under a LIMIT, so the walk stops after the first few uploads
+    'dashboard.recent_uploads': ('ix_upload_history_uploaded_at',),
+    # The distinct recent upload ids are read newest first under a LIMIT
+    'analytics.spread_trends': ('sqlite_autoindex_account_snapshots_1',),
+    'analytics.account_trend': ('sqlite_autoindex_account_snapshots_1',),
+    # The partial index holds only open reviews, and the page lists them all
+    'review_queue.pending': ('ix_review_queue_pending_added_at',),
+}
+
+# Queries that read every contractor by design, so their plans are not
+# checked: the client breakdown totals all of them, contractors without an
+# account included, and the analytics cache keeps it per data version
+FULL_READS = ('analytics.client_stats',)
+
+def hot_queries(today=None):
+    """The dashboard, analytics and review-queue queries, by name.
+    
+    Built with the same query functions the routes use, so the check
+    follows them when they change.
+    """
+    from routes import (dashboard_quarter_end, recent_uploads_query, top_contractors_query,
+                        falling_off_query, pending_reviews_query)
+    today = today or date.today()
+    periods = quarter_periods(today, 2)
+    
+    return {
+        'dashboard.recent_uploads': recent_uploads_query(),
+        'dashboard.top_contractors': top_contractors_query(),
+        'dashboard.falling_off': falling_off_query(today, dashboard_quarter_end(today)),
+        'analytics.rolloff_totals': rolloff_totals_query(periods),
+        'analytics.rolloff_contractors': rolloff_query(periods[:1]).limit(ROLLOFF_PAGE_SIZE + 1),
+        'analytics.client_stats': client_stats_query(),
+        'analytics.spread_trends': spread_trend_query(DEFAULT_TREND_UPLOADS),
+        'analytics.account_trend': spread_trend_query(DEFAULT_TREND_UPLOADS, 1),
+        'review_queue.pending': pending_reviews_query(),
+    }
+
+def explain(query):
+    """Return the backend's plan for a query (ORM query or select) as text lines."""
+    statement = getattr(query, 'statement', query).compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    conn = db.session.connection()
+    
+    if db.engine.dialect.name == 'postgresql':
+        # Ask whether an index *can* serve the query: on small tables the
+        # planner would otherwise prefer a sequential scan regardless
+        conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        plan = conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}').scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        lines = []
+        nodes = [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            lines.append(f"{node['Node Type']} {node.get('Relation Name', '')} {node.get('Index Name', '')}".strip())
+            nodes.extend(node.get('Plans', []))
+        return lines
+    
+    rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}').all()
+    return [row[-1] for row in rows]
+
+def is_table_scan(line, index_walks=()):
+    """Whether a plan line reads a watched table in full, with or without an index.
+    
+    SQLite's ``SCAN t USING [COVERING] INDEX i`` walks the whole index, so it
+    only passes when ``i`` is one of the query's ``index_walks``.
+    """
+    words = line.split()
+    for table in WATCHED_TABLES:
+        if line.startswith('Seq Scan') and table in words:
+            return True
+        if words[:2] == ['SCAN', table]:
+            index = words[words.index('INDEX') + 1] if 'INDEX' in words else None
+            return index not in index_walks
+    return False
+
+def check_query_plans(today=None):
+    """EXPLAIN every hot query and return the names of those scanning a table."""
+    failures = []
+    for name, query in hot_queries(today).items():
+        plan = explain(query)
+        if name in FULL_READS:
+            logging.info(f"{name}: full read by design: {'; '.join(plan)}")
+            continue
+        scans = [line for line in plan if is_table_scan(line, INDEX_WALKS.get(name, ()))]
+        if scans:
+            failures.append(name)
+            logging.warning(f"{name}: table scan: {'; '.join(scans)}")
+        else:
+            logging.info(f"{name}: {'; '.join(plan)}")
+    db.session.rollback()
+    return failures
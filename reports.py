@@ -0,0 +1,133 @@
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import func, case, Numeric
+from app import db
+from models import Account, Contractor
+
+# Contractors per page in the roll-off detail lists
+ROLLOFF_PAGE_SIZE = 20
+
+# Longest roll-off forecast offered on the analytics page
+MAX_FORECAST_QUARTERS = 8
+
+def contractor_summary(contractor):
+    """The contractor fields shown in analytics tables, as plain data."""
+    return {
+        'id': contractor.id,
+        'talent_name': contractor.talent_name,
+        'account_name': contractor.account_name,
+        'talent_end_date': contractor.talent_end_date,
+        'spread_amount': contractor.spread_amount
+    }
+
+def quarter_periods(today, count):
+    """Describe the current quarter (from today on) and the ``count - 1`` after it."""
+    quarter_start = date(today.year, ((today.month - 1) // 3) * 3 + 1, 1)
+    periods = []
+    for index in range(count):
+        quarter_end = quarter_start + relativedelta(months=3) - timedelta(days=1)
+        quarter = (quarter_start.month - 1) // 3 + 1
+        periods.append({
+            'index': index,
+            'quarter': quarter,
+            'year': quarter_start.year,
+            'label': f'Q{quarter} {quarter_start.year}',
+            'start': today if index == 0 else quarter_start,
+            'end': quarter_end
+        })
+        quarter_start += relativedelta(months=3)
+    return periods
+
+def quarterly_rolloff(today, quarters=2):
+    """Roll-off counts and spread per quarter from a single aggregate query.
+    
+    Active contractors are bucketed by talent_end_date with CASE expressions,
+    so any number of quarters costs one query and no contractor rows are
+    loaded. Each quarter also carries the spread projected to remain once its
+    contracts have ended.
+    """
+    periods = quarter_periods(today, quarters)
+    totals = rolloff_totals_query(periods).one()
+    
+    current_total_spread = totals[0]
+    remaining = current_total_spread
+    for period, count, spread in zip(periods, totals[1::2], totals[2::2]):
+        remaining -= spread
+        period['count'] = count or 0
+        period['spread'] = spread
+        period['projected_spread'] = remaining
+    
+    return current_total_spread, periods
+
+def rolloff_totals_query(periods):
+    """Total active spread, then the count and spread ending in each of ``periods``."""
+    columns = [func.coalesce(func.sum(Contractor.spread_amount), 0)]
+    for period in periods:
+        in_quarter = Contractor.talent_end_date.between(period['start'], period['end'])
+        columns.append(func.sum(case((in_quarter, 1), else_=0)))
+        columns.append(func.coalesce(func.sum(case((in_quarter, Contractor.spread_amount), else_=0)), 0))
+    return db.session.query(*columns).filter(Contractor.candidate_status == 'Current')
+
+def rolloff_contractors(period, page=1, per_page=ROLLOFF_PAGE_SIZE):
+    """One page of active contractors ending within a quarter period.
+    
+    Returns the page as plain data and whether another page follows.
+    """
+    contractors = rolloff_query([period]).offset((page - 1) * per_page).limit(per_page + 1).all()
+    
+    return [contractor_summary(c) for c in contractors[:per_page]], len(contractors) > per_page
+
+def client_stats_query():
+    """Per-account contractor counts and spread, largest total spread first.
+    
+    Grouped on the account id, so spellings of one client's name that share
+    an Account are counted together under the account's display name.
+    Contractors without an account form one '' group, as on the dashboard.
+    """
+    return db.session.query(
+        func.coalesce(Account.name, '').label('account_name'),
+        func.count(Contractor.id).label('total_contractors'),
+        func.sum(case((Contractor.candidate_status == 'Current', 1), else_=0)).label('active_contractors'),
+        func.sum(Contractor.spread_amount).label('total_spread'),
+        func.avg(Contractor.spread_amount, type_=Numeric(10, 2)).label('avg_spread'),
+        func.min(Contractor.talent_start_date).label('earliest_start'),
+        func.max(Contractor.talent_end_date).label('latest_end')
+    ).outerjoin(Account, Contractor.account_id == Account.id)\
+     .group_by(Contractor.account_id, Account.name)\
+     .order_by(func.sum(Contractor.spread_amount).desc())
+
+def rolloff_query(periods):
+    """Active contractors ending within ``periods``, soonest first."""
+    return Contractor.query.filter(
+        Contractor.candidate_status == 'Current',
+        Contractor.talent_end_date.between(periods[0]['start'], periods[-1]['end'])
+    ).order_by(Contractor.talent_end_date, Contractor.id)
+
+def compute_analytics(today, quarters=2):
+    """Compute the analytics page figures as plain, cacheable data."""
+    current_total_spread, rolloff = quarterly_rolloff(today, max(quarters, 2))
+    this_quarter, next_quarter = rolloff[0], rolloff[1]
+    
+    # Only the first page of each detail list; more are fetched on demand
+    ending_this_quarter, more_this_quarter = rolloff_contractors(this_quarter)
+    ending_next_quarter, more_next_quarter = rolloff_contractors(next_quarter)
+    
+    # Client analysis with detailed breakdown
+    client_stats = client_stats_query().all()
+    
+    return {
+        'rolloff': rolloff,
+        'ending_this_quarter': ending_this_quarter,
+        'ending_next_quarter': ending_next_quarter,
+        'more_this_quarter': more_this_quarter,
+        'more_next_quarter': more_next_quarter,
+        'current_quarter_loss': this_quarter['spread'],
+        'next_quarter_loss': next_quarter['spread'],
+        'current_total_spread': current_total_spread,
+        'end_of_quarter_spread': this_quarter['projected_spread'],
+        'end_of_next_quarter_spread': next_quarter['projected_spread'],
+        'client_stats': [row._asdict() for row in client_stats],
+        'quarter_end': this_quarter['end'],
+        'next_quarter_end': next_quarter['end'],
+        'current_quarter': this_quarter['quarter']
+    }
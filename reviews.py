@@ -0,0 +1,79 @@
+from datetime import datetime
+from sqlalchemy import select, update, or_
+from app import db
+from models import Account, Contractor, ReviewQueue
+from accounts import account_key
+from aggregates import AggregateDelta, AGGREGATE_FIELDS, apply_aggregate_delta, record_pending_reviews
+
+# Review actions and the action_taken value each one records
+REVIEW_ACTIONS = {'remove': 'removed', 'keep': 'kept'}
+
+def open_review_conditions(review_ids=None, upload_id=None, account_name=None):
+    """WHERE conditions selecting unreviewed queue items.
+    
+    Items can be picked by id, by the upload that queued them, or by the
+    contractor's account (any spelling of its name); the criteria combine. Raises ValueError when
+    nothing is selected.
+    """
+    if review_ids is None and upload_id is None and account_name is None:
+        raise ValueError('Select review items by id, upload or account')
+    
+    conditions = [ReviewQueue.reviewed == False]
+    if review_ids is not None:
+        conditions.append(ReviewQueue.id.in_(review_ids))
+    if upload_id is not None:
+        conditions.append(ReviewQueue.upload_id == upload_id)
+    if account_name is not None:
+        conditions.append(ReviewQueue.contractor_id.in_(
+            select(Contractor.id).join(Account, Contractor.account_id == Account.id)
+            .where(Account.key == account_key(account_name))
+        ))
+    return conditions
+
+def apply_review_action(action, user_id, **selection):
+    """Resolve a selection of open review items with one UPDATE per table.
+    
+    'remove' marks the selected contractors inactive, 'keep' leaves them as
+    they are; either way the items are marked reviewed. Dashboard aggregates
+    and the pending count are adjusted in the same transaction, which the
+    caller commits. Returns the number of items and contractors changed.
+    """
+    if action not in REVIEW_ACTIONS:
+        raise ValueError(f'Unknown review action: {action}')
+    
+    conditions = open_review_conditions(**selection)
+    deactivated = 0
+    
+    if action == 'remove':
+        selected_contractors = select(ReviewQueue.contractor_id).where(*conditions)
+        to_deactivate = [
+            Contractor.id.in_(selected_contractors),
+            or_(Contractor.candidate_status != 'Inactive', Contractor.candidate_status.is_(None))
+        ]
+        
+        delta = AggregateDelta()
+        for row in db.session.execute(
+            select(*[getattr(Contractor, field) for field in AGGREGATE_FIELDS]).where(*to_deactivate)
+        ).mappings():
+            delta.change(dict(row), {**row, 'candidate_status': 'Inactive'})
+        
+        deactivated = db.session.execute(
+            update(Contractor).where(*to_deactivate)
+            .values(candidate_status='Inactive', updated_at=datetime.utcnow(), row_hash=None),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        apply_aggregate_delta(delta)
+    
+    reviewed = db.session.execute(
+        update(ReviewQueue).where(*conditions).values(
+            reviewed=True,
+            reviewed_at=datetime.utcnow(),
+            reviewed_by=user_id,
+            action_taken=REVIEW_ACTIONS[action]
+        ),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    if reviewed:
+        record_pending_reviews(-reviewed)
+    
+    return {'action': action, 'reviewed': reviewed, 'deactivated': deactivated}
@@ -1,16 +1,30 @@
 import os
 import csv
-import pandas as pd
+import hashlib
 from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, jsonify, current_app, send_file, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
-from sqlalchemy import func, case
+from sqlalchemy import case
+from sqlalchemy.orm import joinedload, selectinload, contains_eager
 from app import db, login_manager
-from models import User, Contractor, ReviewQueue, UploadHistory
+from models import User, Contractor, ReviewQueue, UploadHistory, DashboardAggregate
 from forms import LoginForm, RegisterForm, ContractorForm, UploadForm, OnboardingForm
-from utils import parse_date, allowed_file, process_csv_upload
+from utils import parse_date, allowed_file
+from jobs import enqueue_csv_upload
+from validation import validate_spread_report
+from accounts import resolve_account_ids
+from aggregates import contractor_state, record_contractor_change, record_pending_reviews, get_dashboard_aggregates, get_data_version
+from search import search_contractors, get_search_backend
+from pagination import keyset_paginate
+from reviews import apply_review_action
+from reports import compute_analytics, quarter_periods, rolloff_contractors, client_stats_query, rolloff_query, MAX_FORECAST_QUARTERS
+from snapshots import spread_trends, latest_snapshot_upload_id, DEFAULT_TREND_UPLOADS, MAX_TREND_UPLOADS
+from exports import CONTRACTOR_EXPORT_COLUMNS, ExportUnavailable, query_columns, iter_row_batches, csv_chunks, parquet_file
+
+# Uploads listed on the dashboard
+DASHBOARD_RECENT_UPLOADS = 5
 
 # User loader for Flask-Login
 @login_manager.user_loader
@@ -28,137 +42,263 @@ def index():
         return redirect(url_for('auth.onboarding'))
     return redirect(url_for('main.dashboard'))
 
-@main_bp.route('/dashboard')
-@login_required
-def dashboard():
-    if not current_user.onboarding_completed:
-        return redirect(url_for('auth.onboarding'))
-    from datetime import datetime, timedelta
-    from dateutil.relativedelta import relativedelta
-    
-    # Get dashboard statistics
-    total_contractors = Contractor.query.count()
-    active_contractors = Contractor.query.filter_by(candidate_status='Current').count()
-    pending_reviews = ReviewQueue.query.filter_by(reviewed=False).count()
-    
-    # Recent uploads
-    recent_uploads = UploadHistory.query.order_by(UploadHistory.uploaded_at.desc()).limit(5).all()
-    
-    # Active contractors with highest spreads
-    top_contractors = Contractor.query.filter_by(candidate_status='Current')\
+def dashboard_quarter_end(today):
+    """Last day of the calendar quarter ``today`` falls in."""
+    return datetime(today.year, ((today.month - 1) // 3 + 1) * 3, 1).date() + relativedelta(months=1) - timedelta(days=1)
+
+def recent_uploads_query():
+    """The latest uploads shown on the dashboard, newest first."""
+    return UploadHistory.query.order_by(UploadHistory.uploaded_at.desc()).limit(DASHBOARD_RECENT_UPLOADS)
+
+def top_contractors_query():
+    """Active contractors with the highest spreads."""
+    return Contractor.query.filter_by(candidate_status='Current')\
         .filter(Contractor.spread_amount.isnot(None))\
-        .order_by(Contractor.spread_amount.desc()).limit(10).all()
-    
-    # Quarterly analysis
-    today = datetime.now().date()
-    quarter_end = datetime(today.year, ((today.month - 1) // 3 + 1) * 3, 1).date() + relativedelta(months=1) - timedelta(days=1)
-    next_quarter_end = quarter_end + relativedelta(months=3)
-    
-    # Contractors falling off this quarter
-    falling_off_this_quarter = Contractor.query.filter(
+        .order_by(Contractor.spread_amount.desc()).limit(10)
+
+def falling_off_query(today, quarter_end):
+    """First few active contractors whose contracts end between today and ``quarter_end``."""
+    return Contractor.query.filter(
         Contractor.candidate_status == 'Current',
         Contractor.talent_end_date.isnot(None),
         Contractor.talent_end_date <= quarter_end,
         Contractor.talent_end_date >= today
-    ).all()
+    ).order_by(Contractor.talent_end_date).limit(5)
+
+def pending_reviews_query():
+    """Open review items with their contractors, newest first."""
+    return ReviewQueue.query.filter_by(reviewed=False).join(Contractor).order_by(ReviewQueue.added_at.desc())
+
+def dashboard_data(today):
+    """Figures and lists shown on the dashboard, for the page and /api/dashboard."""
+    quarter_end = dashboard_quarter_end(today)
     
-    # Calculate spread falling off this quarter
-    spread_falling_off = sum(c.spread_amount for c in falling_off_this_quarter if c.spread_amount) or 0
+    # Counts, spreads and client distribution come from the aggregate table
+    stats = get_dashboard_aggregates(today, quarter_end)
     
-    # Current active spread
-    current_active_spread = db.session.query(func.sum(Contractor.spread_amount))\
-        .filter(Contractor.candidate_status == 'Current')\
-        .filter(Contractor.spread_amount.isnot(None))\
-        .scalar() or 0
+    recent_uploads = recent_uploads_query().options(joinedload(UploadHistory.uploader)).all()
+    top_contractors = top_contractors_query().all()
+    falling_off_this_quarter = falling_off_query(today, quarter_end).all()
     
     # Projected next quarter spread (current minus falling off)
-    next_quarter_spread = current_active_spread - spread_falling_off
-    
-    # Client distribution
-    client_distribution = db.session.query(
-        Contractor.account_name,
-        func.count(Contractor.id).label('contractor_count'),
-        func.sum(Contractor.spread_amount).label('total_spread')
-    ).filter(
-        Contractor.candidate_status == 'Current'
-    ).group_by(Contractor.account_name)\
-     .order_by(func.count(Contractor.id).desc()).all()
-    
-    # Monthly statistics
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    monthly_revenue = db.session.query(func.sum(Contractor.spread_amount))\
-        .filter(func.extract('month', Contractor.created_at) == current_month)\
-        .filter(func.extract('year', Contractor.created_at) == current_year)\
-        .scalar() or 0
-    
-    return render_template('dashboard.html',
-                         total_contractors=total_contractors,
-                         active_contractors=active_contractors,
-                         pending_reviews=pending_reviews,
-                         recent_uploads=recent_uploads,
-                         top_contractors=top_contractors,
-                         monthly_revenue=monthly_revenue,
-                         falling_off_this_quarter=falling_off_this_quarter,
-                         spread_falling_off=spread_falling_off,
-                         current_active_spread=current_active_spread,
-                         next_quarter_spread=next_quarter_spread,
-                         client_distribution=client_distribution,
-                         quarter_end=quarter_end)
+    next_quarter_spread = stats['current_active_spread'] - stats['spread_falling_off']
+    
+    return dict(total_contractors=stats['total_contractors'],
+                active_contractors=stats['active_contractors'],
+                pending_reviews=stats['pending_reviews'],
+                recent_uploads=recent_uploads,
+                top_contractors=top_contractors,
+                monthly_revenue=stats['monthly_revenue'],
+                falling_off_this_quarter=falling_off_this_quarter,
+                falling_off_count=stats['falling_off_count'],
+                spread_falling_off=stats['spread_falling_off'],
+                current_active_spread=stats['current_active_spread'],
+                next_quarter_spread=next_quarter_spread,
+                client_distribution=stats['client_distribution'],
+                quarter_end=quarter_end)
+
+def dashboard_etag(today):
+    """Strong ETag for the dashboard, read from a few indexed rows.
+    
+    The data version moves with every contractor write, renames and other
+    edits that leave the figures alone included, and the pending
+    review counter with every review; the recent uploads are included so
+    upload progress and failures show up, and the day so the quarter and
+    falling-off figures roll over.
+    """
+    counters = dict(DashboardAggregate.query.with_entities(DashboardAggregate.metric, DashboardAggregate.count)
+                    .filter(DashboardAggregate.metric.in_(['data_version', 'pending_reviews']),
+                            DashboardAggregate.bucket == ''))
+    uploads = recent_uploads_query()\
+        .with_entities(UploadHistory.id, UploadHistory.status, UploadHistory.records_processed).all()
+    marker = (today.isoformat(), counters.get('data_version'), counters.get('pending_reviews'),
+              [tuple(upload) for upload in uploads])
+    return hashlib.sha1(repr(marker).encode()).hexdigest()
+
+@main_bp.route('/dashboard')
+@login_required
+def dashboard():
+    if not current_user.onboarding_completed:
+        return redirect(url_for('auth.onboarding'))
+    today = datetime.now().date()
+    return render_template('dashboard.html', dashboard_etag=dashboard_etag(today), **dashboard_data(today))
+
+@main_bp.route('/api/dashboard')
+@login_required
+def dashboard_api():
+    today = datetime.now().date()
+    etag = dashboard_etag(today)
+    
+    # Polling tabs get a 304 until the data behind the dashboard moves
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        data = dashboard_data(today)
+        current = float(data['current_active_spread'] or 0)
+        response = jsonify(
+            total_contractors=data['total_contractors'],
+            active_contractors=data['active_contractors'],
+            pending_reviews=data['pending_reviews'],
+            monthly_revenue=float(data['monthly_revenue'] or 0),
+            current_active_spread=current,
+            falling_off_count=data['falling_off_count'],
+            spread_falling_off=float(data['spread_falling_off'] or 0),
+            next_quarter_spread=float(data['next_quarter_spread'] or 0),
+            retention_rate=float(data['next_quarter_spread']) / current * 100 if current > 0 else 0,
+            quarter_end=data['quarter_end'].isoformat(),
+            falling_off_this_quarter=[{
+                'id': contractor.id,
+                'talent_name': contractor.talent_name,
+                'talent_end_date': contractor.talent_end_date.isoformat()
+            } for contractor in data['falling_off_this_quarter']],
+            client_distribution=[{
+                'account_name': client['account_name'],
+                'contractor_count': client['contractor_count'],
+                'total_spread': float(client['total_spread'] or 0)
+            } for client in data['client_distribution']],
+            recent_uploads=[{
+                'id': upload.id,
+                'filename': upload.filename,
+                'status': upload.status,
+                'uploaded_at': upload.uploaded_at.isoformat(),
+                'records_processed': upload.records_processed or 0,
+                'error_message': upload.error_message
+            } for upload in data['recent_uploads']]
+        )
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @main_bp.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload_csv():
     form = UploadForm()
+    validation = None
     if form.validate_on_submit():
         file = form.file.data
-        if file and allowed_file(file.filename):
+        if file and allowed_file(file.filename) and form.dry_run.data:
             try:
-                # Process the CSV upload
-                result = process_csv_upload(file, current_user.id)
+                # Dry run: checked here across a process pool, nothing is written
+                validation = validate_spread_report(file, pool=current_app.extensions['validation_pool'])
+                if request.accept_mimetypes.best == 'application/json':
+                    return jsonify(validation)
+            except Exception as e:
+                flash(f'Error validating CSV: {str(e)}', 'error')
+        elif file and allowed_file(file.filename):
+            try:
+                # Hand the CSV to the background worker pool, unless it was just uploaded
+                job_id, duplicate = enqueue_csv_upload(file, current_user.id, profile=form.profile.data,
+                                                       force=form.force.data)
                 
-                flash(f'CSV processed successfully! {result["added"]} contractors added, '
-                      f'{result["updated"]} updated, {result["queued"]} queued for review.',
-                      'success')
+                if request.accept_mimetypes.best == 'application/json':
+                    return jsonify(job_id=job_id, duplicate=duplicate,
+                                   status_url=url_for('main.upload_status', job_id=job_id)), 200 if duplicate else 202
                 
-                return redirect(url_for('main.dashboard'))
+                if duplicate:
+                    flash('This file is identical to the latest upload, so it was not processed again. '
+                          'Showing the earlier results; tick "Process again" to force it.', 'info')
+                else:
+                    flash('CSV upload queued for processing.', 'info')
+                return redirect(url_for('main.upload_csv', job=job_id))
             except Exception as e:
                 flash(f'Error processing CSV: {str(e)}', 'error')
         else:
             flash('Invalid file format. Please upload a CSV file.', 'error')
     
-    return render_template('upload.html', form=form)
+    # Stage timings of recent uploads, so slowdowns stand out
+    recent_uploads = UploadHistory.query.filter(UploadHistory.stage_timings.isnot(None))\
+        .order_by(UploadHistory.uploaded_at.desc()).limit(5).all()
+    
+    return render_template('upload.html', form=form, job_id=request.args.get('job', type=int),
+                           recent_uploads=recent_uploads, validation=validation)
+
+@main_bp.route('/upload/<int:job_id>/status')
+@login_required
+def upload_status(job_id):
+    upload = db.session.get(UploadHistory, job_id)
+    if upload is None:
+        return jsonify(error='Unknown upload job'), 404
+    
+    # Jobs run by another worker process are only known through UploadHistory
+    job = current_app.extensions['upload_jobs'].get(job_id)
+    
+    return jsonify(
+        job_id=job_id,
+        state=job['state'] if job else upload.status,
+        status=upload.status,
+        filename=upload.filename,
+        records_processed=upload.records_processed or 0,
+        records_added=upload.records_added or 0,
+        records_updated=upload.records_updated or 0,
+        records_unchanged=upload.records_unchanged or 0,
+        records_queued_for_review=upload.records_queued_for_review or 0,
+        chunks_processed=upload.chunks_processed or 0,
+        elapsed_seconds=upload.elapsed_seconds,
+        rows_per_second=upload.rows_per_second,
+        stages=upload.stage_breakdown,
+        profiled=upload.profile_report is not None,
+        error=upload.error_message or (job['error'] if job else None)
+    )
+
+@main_bp.route('/upload/<int:job_id>/profile')
+@login_required
+def upload_profile(job_id):
+    upload = db.get_or_404(UploadHistory, job_id)
+    if upload.profile_report is None:
+        return jsonify(error='No profile was captured for this upload'), 404
+    return upload.profile_report, 200, {'Content-Type': 'text/plain; charset=utf-8'}
 
 @main_bp.route('/review-queue')
 @login_required
 def review_queue():
-    pending_reviews = ReviewQueue.query.filter_by(reviewed=False)\
-        .join(Contractor).order_by(ReviewQueue.added_at.desc()).all()
+    # Contractors come from the join; the few distinct users in one extra query
+    pending_reviews = pending_reviews_query().options(contains_eager(ReviewQueue.contractor),
+                                                      selectinload(ReviewQueue.added_by_user)).all()
     
     return render_template('review_queue.html', pending_reviews=pending_reviews)
 
 @main_bp.route('/review-queue/<int:review_id>/action/<action>')
 @login_required
 def review_action(review_id, action):
-    review_item = ReviewQueue.query.get_or_404(review_id)
-    
-    if action == 'remove':
-        # Mark contractor as inactive
-        review_item.contractor.candidate_status = 'Inactive'
-        review_item.action_taken = 'removed'
-    elif action == 'keep':
-        # Keep contractor active
-        review_item.action_taken = 'kept'
+    ReviewQueue.query.get_or_404(review_id)
     
-    review_item.reviewed = True
-    review_item.reviewed_at = datetime.utcnow()
-    review_item.reviewed_by = current_user.id
+    try:
+        apply_review_action(action, current_user.id, review_ids=[review_id])
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('main.review_queue'))
     
     db.session.commit()
     flash(f'Review item {action}d successfully.', 'success')
     
     return redirect(url_for('main.review_queue'))
 
+@main_bp.route('/review-queue/bulk', methods=['POST'])
+@login_required
+def bulk_review_action():
+    """Apply keep/remove to selected review items, or to an upload's or account's items."""
+    # JSON only: a cross-site form post cannot send it, so the endpoint needs no CSRF token
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify(error='Expected a JSON object'), 400
+    review_ids = data.get('review_ids')
+    if review_ids is not None and not isinstance(review_ids, list):
+        return jsonify(error='review_ids must be a list'), 400
+    
+    try:
+        counts = apply_review_action(
+            data.get('action'), current_user.id,
+            review_ids=[int(review_id) for review_id in review_ids] if review_ids is not None else None,
+            upload_id=int(data['upload_id']) if data.get('upload_id') else None,
+            account_name=data.get('account_name') or None
+        )
+    except (ValueError, TypeError) as e:
+        db.session.rollback()
+        return jsonify(error=str(e)), 400
+    
+    db.session.commit()
+    return jsonify(counts)
+
 # Authentication Blueprint
 auth_bp = Blueprint('auth', __name__)
 
@@ -235,33 +375,78 @@ def logout():
 # Contractors Blueprint
 contractors_bp = Blueprint('contractors', __name__)
 
+def contractor_listing_query(search, status):
+    """Contractors matching the list page filters; searches come back ranked."""
+    query = Contractor.query
+    
+    if status:
+        query = query.filter_by(candidate_status=status)
+    
+    if search:
+        query = search_contractors(query, search, get_search_backend())
+    
+    return query
+
+def export_response(query, filename, export_format):
+    """Stream a query as a CSV download, or send it as a Parquet file."""
+    columns = query_columns(query)
+    batches = iter_row_batches(query)
+    
+    if export_format == 'parquet':
+        try:
+            output = parquet_file(columns, batches)
+        except ExportUnavailable as e:
+            return jsonify(error=str(e)), 501
+        return send_file(output, mimetype='application/vnd.apache.parquet',
+                         as_attachment=True, download_name=f'{filename}.parquet')
+    
+    if export_format != 'csv':
+        return jsonify(error=f'Unknown export format: {export_format}'), 400
+    
+    return Response(stream_with_context(csv_chunks(columns, batches)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}.csv'})
+
 @contractors_bp.route('/')
 @login_required
 def list_contractors():
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', '')
     search = request.args.get('search', '')
     status = request.args.get('status', '')
     
-    query = Contractor.query
+    query = contractor_listing_query(search, status)
     
     if search:
-        query = query.filter(
-            (Contractor.talent_name.ilike(f'%{search}%')) |
-            (Contractor.account_name.ilike(f'%{search}%')) |
-            (Contractor.job_title.ilike(f'%{search}%'))
-        )
-    
-    if status:
-        query = query.filter_by(candidate_status=status)
-    
-    contractors = query.order_by(Contractor.created_at.desc())\
-        .paginate(page=page, per_page=20, error_out=False)
+        # Ranked search results keep numbered pages
+        contractors = query.paginate(page=page, per_page=20, error_out=False)
+    else:
+        # Plain listings page by (created_at, id) cursor; the total is
+        # counted once per data version instead of on every page
+        cache = current_app.extensions['analytics_cache']
+        total = cache.get_or_set(('contractor_count', status, get_data_version()), query.count)
+        contractors = keyset_paginate(query, cursor=cursor, per_page=20, total=total)
     
     return render_template('contractors/list.html', 
                          contractors=contractors,
+                         keyset=not search,
                          search=search,
                          status=status)
 
+@contractors_bp.route('/export')
+@login_required
+def export_contractors():
+    """All contractors matching the list filters (search, status) as CSV or Parquet"""
+    search = request.args.get('search', '')
+    status = request.args.get('status', '')
+    
+    query = contractor_listing_query(search, status)
+    if not search:
+        query = query.order_by(Contractor.created_at.desc(), Contractor.id.desc())
+    query = query.with_entities(*[getattr(Contractor, column) for column in CONTRACTOR_EXPORT_COLUMNS])
+    
+    return export_response(query, f'contractors-{date.today().isoformat()}',
+                           request.args.get('format', 'csv'))
+
 @contractors_bp.route('/add', methods=['GET', 'POST'])
 @login_required
 def add_contractor():
@@ -278,10 +463,13 @@ def add_contractor():
             recruiter=form.recruiter.data,
             account_manager=form.account_manager.data,
             account_name=form.account_name.data,
+            account_id=resolve_account_ids([form.account_name.data]).get(form.account_name.data),
             spread_amount=form.spread_amount.data,
             created_by=current_user.id
         )
         db.session.add(contractor)
+        db.session.flush()
+        record_contractor_change(new_state=contractor_state(contractor))
         db.session.commit()
         
         flash('Contractor added successfully!', 'success')
@@ -292,7 +480,7 @@ def add_contractor():
 @contractors_bp.route('/<int:id>')
 @login_required
 def view_contractor(id):
-    contractor = Contractor.query.get_or_404(id)
+    contractor = Contractor.query.options(joinedload(Contractor.creator)).get_or_404(id)
     return render_template('contractors/view.html', contractor=contractor)
 
 @contractors_bp.route('/<int:id>/edit', methods=['GET', 'POST'])
@@ -302,8 +490,13 @@ def edit_contractor(id):
     form = ContractorForm(obj=contractor)
     
     if form.validate_on_submit():
+        old_state = contractor_state(contractor)
         form.populate_obj(contractor)
+        contractor.account_id = resolve_account_ids([contractor.account_name]).get(contractor.account_name)
         contractor.updated_at = datetime.utcnow()
+        # Let the next upload rewrite hand-edited fields even if its row is unchanged
+        contractor.row_hash = None
+        record_contractor_change(old_state, contractor_state(contractor))
         db.session.commit()
         
         flash('Contractor updated successfully!', 'success')
@@ -323,6 +516,7 @@ def delete_contractor(id):
         added_by=current_user.id
     )
     db.session.add(review_item)
+    record_pending_reviews(1)
     db.session.commit()
     
     flash('Contractor has been queued for review.', 'info')
@@ -333,67 +527,117 @@ def delete_contractor(id):
 def analytics():
     """Detailed analytics page for quarterly forecasting and client analysis"""
     today = datetime.now().date()
+    quarters = min(max(request.args.get('quarters', 2, type=int), 2), MAX_FORECAST_QUARTERS)
     
-    # Calculate quarters
-    current_quarter = ((today.month - 1) // 3) + 1
-    quarter_end = datetime(today.year, current_quarter * 3, 1).date() + relativedelta(months=1) - timedelta(days=1)
-    next_quarter_start = quarter_end + timedelta(days=1)
-    next_quarter_end = quarter_end + relativedelta(months=3)
+    # Results are reused until the day or the contractor data changes
+    cache = current_app.extensions['analytics_cache']
+    context = cache.get_or_set(('analytics', today, quarters, get_data_version()),
+                               lambda: compute_analytics(today, quarters))
     
-    # Contractors ending this quarter
-    ending_this_quarter = Contractor.query.filter(
-        Contractor.candidate_status == 'Current',
-        Contractor.talent_end_date.isnot(None),
-        Contractor.talent_end_date <= quarter_end,
-        Contractor.talent_end_date >= today
-    ).order_by(Contractor.talent_end_date).all()
-    
-    # Contractors ending next quarter
-    ending_next_quarter = Contractor.query.filter(
-        Contractor.candidate_status == 'Current',
-        Contractor.talent_end_date.isnot(None),
-        Contractor.talent_end_date <= next_quarter_end,
-        Contractor.talent_end_date > quarter_end
-    ).order_by(Contractor.talent_end_date).all()
+    return render_template('analytics.html', quarters=quarters, **context)
+
+@main_bp.route('/analytics/rolloff/<int:index>')
+@login_required
+def analytics_rolloff(index):
+    """One page of the contractors ending in a forecast quarter, as JSON"""
+    if index >= MAX_FORECAST_QUARTERS:
+        return jsonify(error='Quarter out of range'), 404
+    
+    page = max(request.args.get('page', 1, type=int), 1)
+    period = quarter_periods(datetime.now().date(), index + 1)[index]
+    contractors, has_next = rolloff_contractors(period, page)
+    
+    return jsonify(
+        quarter=period['label'],
+        page=page,
+        has_next=has_next,
+        contractors=[
+            {
+                'id': c['id'],
+                'talent_name': c['talent_name'],
+                'account_name': c['account_name'],
+                'talent_end_date': c['talent_end_date'].strftime('%m/%d/%Y'),
+                'spread_amount': float(c['spread_amount'] or 0),
+                'url': url_for('contractors.view_contractor', id=c['id'])
+            }
+            for c in contractors
+        ]
+    )
+
+@main_bp.route('/analytics/trends')
+@login_required
+def analytics_trends():
+    """Per-account contractor and spread series over recent uploads, as JSON"""
+    uploads = min(max(request.args.get('uploads', DEFAULT_TREND_UPLOADS, type=int), 2), MAX_TREND_UPLOADS)
+    account = request.args.get('account')
+    
+    # Snapshots only change when an upload completes
+    cache = current_app.extensions['analytics_cache']
+    trends = cache.get_or_set(('trends', uploads, account, latest_snapshot_upload_id()),
+                              lambda: spread_trends(uploads, account))
+    
+    return jsonify(
+        uploads=[
+            {'id': upload['id'], 'uploaded_at': upload['uploaded_at'].isoformat()}
+            for upload in trends['uploads']
+        ],
+        accounts=[
+            {
+                **series,
+                'total_spread': [float(value) for value in series['total_spread']],
+                'active_spread': [float(value) for value in series['active_spread']]
+            }
+            for series in trends['accounts']
+        ]
+    )
+
+@main_bp.route('/analytics/export/<dataset>')
+@login_required
+def export_analytics(dataset):
+    """Client statistics or the quarterly roll-off detail as CSV or Parquet"""
+    today = datetime.now().date()
     
-    # Calculate spreads
-    current_quarter_loss = sum(c.spread_amount for c in ending_this_quarter if c.spread_amount) or 0
-    next_quarter_loss = sum(c.spread_amount for c in ending_next_quarter if c.spread_amount) or 0
+    if dataset == 'clients':
+        query = client_stats_query()
+    elif dataset == 'rolloff':
+        quarters = min(max(request.args.get('quarters', 2, type=int), 1), MAX_FORECAST_QUARTERS)
+        periods = quarter_periods(today, quarters)
+        quarter = case(*[
+            (Contractor.talent_end_date.between(period['start'], period['end']), period['label'])
+            for period in periods
+        ]).label('quarter')
+        query = rolloff_query(periods).with_entities(
+            quarter, Contractor.id, Contractor.talent_id, Contractor.talent_name,
+            Contractor.account_name, Contractor.talent_end_date, Contractor.spread_amount
+        )
+    else:
+        return jsonify(error=f'Unknown analytics export: {dataset}'), 404
     
-    # Current total spread
-    current_total_spread = db.session.query(func.sum(Contractor.spread_amount))\
-        .filter(Contractor.candidate_status == 'Current')\
-        .filter(Contractor.spread_amount.isnot(None))\
-        .scalar() or 0
-    
-    # Projections
-    end_of_quarter_spread = current_total_spread - current_quarter_loss
-    end_of_next_quarter_spread = end_of_quarter_spread - next_quarter_loss
-    
-    # Client analysis with detailed breakdown
-    client_stats = db.session.query(
-        Contractor.account_name,
-        func.count(Contractor.id).label('total_contractors'),
-        func.sum(case((Contractor.candidate_status == 'Current', 1), else_=0)).label('active_contractors'),
-        func.sum(Contractor.spread_amount).label('total_spread'),
-        func.avg(Contractor.spread_amount).label('avg_spread'),
-        func.min(Contractor.talent_start_date).label('earliest_start'),
-        func.max(Contractor.talent_end_date).label('latest_end')
-    ).filter(
-        Contractor.account_name.isnot(None),
-        Contractor.account_name != ''
-    ).group_by(Contractor.account_name)\
-     .order_by(func.sum(Contractor.spread_amount).desc()).all()
-    
-    return render_template('analytics.html',
-                         ending_this_quarter=ending_this_quarter,
-                         ending_next_quarter=ending_next_quarter,
-                         current_quarter_loss=current_quarter_loss,
-                         next_quarter_loss=next_quarter_loss,
-                         current_total_spread=current_total_spread,
-                         end_of_quarter_spread=end_of_quarter_spread,
-                         end_of_next_quarter_spread=end_of_next_quarter_spread,
-                         client_stats=client_stats,
-                         quarter_end=quarter_end,
-                         next_quarter_end=next_quarter_end,
-                         current_quarter=current_quarter)
+    return export_response(query, f'{dataset}-{today.isoformat()}', request.args.get('format', 'csv'))
+
+@main_bp.route('/analytics/cache-stats')
+@login_required
+def analytics_cache_stats():
+    return jsonify(current_app.extensions['analytics_cache'].stats())
+
+@main_bp.route('/metrics')
+def metrics():
+    """Request, SQL and cache metrics in Prometheus text format.
+    
+    Scrapers authenticate with ``Authorization: Bearer <METRICS_TOKEN>``;
+    logged-in users can always read it.
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if not current_user.is_authenticated and \
+            not (token and request.headers.get('Authorization') == f'Bearer {token}'):
+        return current_app.login_manager.unauthorized()
+    
+    cache_stats = current_app.extensions['analytics_cache'].stats()
+    cache_metrics = [
+        ('analytics_cache_hits_total', 'Analytics cache hits.', 'counter', [((), cache_stats['hits'])]),
+        ('analytics_cache_misses_total', 'Analytics cache misses.', 'counter', [((), cache_stats['misses'])]),
+        ('analytics_cache_evictions_total', 'Analytics cache evictions.', 'counter', [((), cache_stats['evictions'])]),
+        ('analytics_cache_entries', 'Entries in the analytics cache.', 'gauge', [((), cache_stats['size'])]),
+    ]
+    body = current_app.extensions['metrics'].render(extra=cache_metrics)
+    return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
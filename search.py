@@ -0,0 +1,127 @@
+import logging
+from flask import current_app
+from sqlalchemy import text, func, select, literal_column
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from models import Contractor
+
+# Columns matched by the contractor search box
+SEARCH_COLUMNS = ('talent_name', 'account_name', 'job_title')
+
+# Shortest search term the trigram indexes can serve
+MIN_INDEXED_SEARCH_LENGTH = 3
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    *[
+        f"CREATE INDEX IF NOT EXISTS ix_contractors_{column}_trgm "
+        f"ON contractors USING gin ({column} gin_trgm_ops)"
+        for column in SEARCH_COLUMNS
+    ]
+]
+
+SQLITE_FTS_EXISTS = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contractors_fts'"
+
+SQLITE_SEARCH_DDL = [
+    # External-content FTS5 table over contractors, tokenized into trigrams
+    # so that substring searches behave like the old ILIKE '%term%'
+    f"CREATE VIRTUAL TABLE contractors_fts USING fts5("
+    f"{', '.join(SEARCH_COLUMNS)}, content='contractors', content_rowid='id', tokenize='trigram')",
+    f"""CREATE TRIGGER contractors_fts_insert AFTER INSERT ON contractors BEGIN
+        INSERT INTO contractors_fts(rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES (new.id, {', '.join('new.' + c for c in SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER contractors_fts_delete AFTER DELETE ON contractors BEGIN
+        INSERT INTO contractors_fts(contractors_fts, rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {', '.join('old.' + c for c in SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER contractors_fts_update AFTER UPDATE OF {', '.join(SEARCH_COLUMNS)} ON contractors BEGIN
+        INSERT INTO contractors_fts(contractors_fts, rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {', '.join('old.' + c for c in SEARCH_COLUMNS)});
+        INSERT INTO contractors_fts(rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES (new.id, {', '.join('new.' + c for c in SEARCH_COLUMNS)});
+    END""",
+    "INSERT INTO contractors_fts(contractors_fts) VALUES ('rebuild')",
+]
+
+def install_search_index(engine):
+    """Create the contractor search index for the current backend.
+    
+    PostgreSQL gets pg_trgm GIN indexes, SQLite an FTS5 trigram table kept in
+    sync by triggers. Returns the backend in use: 'trigram', 'fts5', or
+    'like' when neither is available and searches fall back to ILIKE scans.
+    """
+    dialect = engine.dialect.name
+    try:
+        if dialect == 'postgresql':
+            with engine.begin() as conn:
+                for statement in POSTGRES_SEARCH_DDL:
+                    conn.execute(text(statement))
+            return 'trigram'
+        
+        if dialect == 'sqlite':
+            with engine.begin() as conn:
+                exists = conn.execute(text(SQLITE_FTS_EXISTS)).first()
+                if not exists:
+                    for statement in SQLITE_SEARCH_DDL:
+                        conn.execute(text(statement))
+                    logging.info("Contractor search index created")
+            return 'fts5'
+    except SQLAlchemyError as e:
+        logging.warning(f"Contractor search index unavailable, using ILIKE search: {e}")
+    
+    return 'like'
+
+def detect_search_backend(engine):
+    """Report which backend install_search_index set up, without running DDL."""
+    dialect = engine.dialect.name
+    try:
+        with engine.connect() as conn:
+            if dialect == 'postgresql':
+                installed = conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first()
+                return 'trigram' if installed else 'like'
+            if dialect == 'sqlite':
+                return 'fts5' if conn.execute(text(SQLITE_FTS_EXISTS)).first() else 'like'
+    except SQLAlchemyError as e:
+        logging.warning(f"Could not detect the contractor search index, using ILIKE search: {e}")
+    return 'like'
+
+def get_search_backend():
+    """The app's search backend, detected on first use when startup skipped init."""
+    backend = current_app.config.get('SEARCH_BACKEND')
+    if backend is None:
+        backend = current_app.config['SEARCH_BACKEND'] = detect_search_backend(db.engine)
+    return backend
+
+def search_contractors(query, search, backend):
+    """Filter a Contractor query by a search term, best matches first.
+    
+    Terms too short for the trigram indexes, and the 'like' backend, use the
+    original ILIKE filter ordered by newest first.
+    """
+    if backend == 'fts5' and len(search) >= MIN_INDEXED_SEARCH_LENGTH:
+        # Quote the term as an FTS5 phrase so user input is matched literally
+        phrase = '"' + search.replace('"', '""') + '"'
+        matches = select(
+            literal_column('rowid').label('contractor_id'),
+            literal_column('rank').label('rank')
+        ).select_from(text('contractors_fts')).where(
+            text('contractors_fts MATCH :phrase').bindparams(phrase=phrase)
+        ).subquery()
+        return query.join(matches, Contractor.id == matches.c.contractor_id)\
+            .order_by(matches.c.rank, Contractor.created_at.desc())
+    
+    query = query.filter(
+        (Contractor.talent_name.ilike(f'%{search}%')) |
+        (Contractor.account_name.ilike(f'%{search}%')) |
+        (Contractor.job_title.ilike(f'%{search}%'))
+    )
+    
+    if backend == 'trigram' and len(search) >= MIN_INDEXED_SEARCH_LENGTH:
+        # The ILIKE filters are served by the GIN indexes; rank by closeness
+        rank = func.greatest(*[
+            func.word_similarity(search, getattr(Contractor, column)) for column in SEARCH_COLUMNS
+        ])
+        return query.order_by(rank.desc(), Contractor.created_at.desc())
+    
+    return query.order_by(Contractor.created_at.desc())
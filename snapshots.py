@@ -0,0 +1,149 @@
+from sqlalchemy import Integer, MetaData, Table, inspect, select, insert, func, case, literal
+from app import db
+from models import Account, Contractor, AccountSnapshot, UploadHistory
+from accounts import account_key, resolve_account_ids
+from migrations import previous_table_name
+
+# Uploads covered by a trend series when the caller does not say
+DEFAULT_TREND_UPLOADS = 12
+
+# Longest trend series served
+MAX_TREND_UPLOADS = 52
+
+# Accounts in a trend when no account is named, largest active spread first
+TREND_TOP_ACCOUNTS = 10
+
+# Per-account figures stored in each snapshot, in series order
+SNAPSHOT_FIELDS = ('contractor_count', 'active_count', 'total_spread', 'active_spread')
+
+def record_account_snapshot(upload_id):
+    """Store per-account totals as of ``upload_id`` with one INSERT ... SELECT.
+    
+    The totals are grouped in the database by account id (0 for contractors
+    without an account), so nothing is loaded into Python. Returns the
+    number of accounts snapshotted.
+    """
+    active = Contractor.candidate_status == 'Current'
+    spread = func.coalesce(Contractor.spread_amount, 0)
+    totals = select(
+        literal(upload_id, Integer),
+        func.coalesce(Contractor.account_id, 0),
+        func.count(Contractor.id),
+        func.sum(case((active, 1), else_=0)),
+        func.sum(spread),
+        func.sum(case((active, spread), else_=0))
+    ).group_by(Contractor.account_id)
+    
+    result = db.session.execute(
+        insert(AccountSnapshot).from_select(['upload_id', 'account_id', *SNAPSHOT_FIELDS], totals)
+    )
+    return result.rowcount
+
+def latest_snapshot_upload_id():
+    """The newest upload with a snapshot, used to key cached trends."""
+    return db.session.execute(select(func.max(AccountSnapshot.upload_id))).scalar()
+
+def snapshot_account_id(name):
+    """The id a named account's snapshots are stored under, or None if no account has that name."""
+    key = account_key(name)
+    if key is None:
+        return 0
+    return db.session.execute(select(Account.id).where(Account.key == key)).scalar()
+
+def spread_trend_query(uploads, account_id=None):
+    """Snapshot rows of the last ``uploads`` snapshotted uploads, oldest first.
+    
+    A range scan on the snapshot primary key, or on the account index when
+    ``account_id`` is given.
+    """
+    recent = select(AccountSnapshot.upload_id).distinct()\
+        .order_by(AccountSnapshot.upload_id.desc()).limit(uploads).subquery()
+    # A primary key lookup per row; as a join, small upload tables get walked instead
+    uploaded_at = select(UploadHistory.uploaded_at).where(UploadHistory.id == AccountSnapshot.upload_id)\
+        .scalar_subquery().label('uploaded_at')
+    query = select(
+        AccountSnapshot.upload_id, uploaded_at, AccountSnapshot.account_id,
+        *[getattr(AccountSnapshot, field) for field in SNAPSHOT_FIELDS]
+    ).where(AccountSnapshot.upload_id >= select(func.min(recent.c.upload_id)).scalar_subquery())\
+        .order_by(AccountSnapshot.upload_id)
+    if account_id is not None:
+        query = query.where(AccountSnapshot.account_id == account_id)
+    return query
+
+def spread_trends(uploads=DEFAULT_TREND_UPLOADS, account=None, top=TREND_TOP_ACCOUNTS):
+    """Per-account series over the last ``uploads`` snapshotted uploads.
+    
+    Every point is read by one spread_trend_query. Series are aligned with
+    the returned uploads, oldest first; an account missing from an upload
+    had no contractors then and reads as zero. ``account`` is matched like
+    uploads match names. Without it, the ``top`` accounts by active spread
+    in the latest upload are returned. Names are joined for the final rows.
+    """
+    account_id = None
+    if account is not None:
+        account_id = snapshot_account_id(account)
+        if account_id is None:
+            return {'uploads': [], 'accounts': []}
+    
+    upload_dates = {}
+    points = {}
+    for row in db.session.execute(spread_trend_query(uploads, account_id)):
+        upload_dates[row.upload_id] = row.uploaded_at
+        points.setdefault(row.account_id, {})[row.upload_id] = row
+    
+    upload_ids = list(upload_dates)
+    if account is None and upload_ids:
+        latest = upload_ids[-1]
+        ranked = sorted(points, key=lambda key: points[key][latest].active_spread if latest in points[key] else 0,
+                        reverse=True)
+        points = {key: points[key] for key in ranked[:top]}
+    
+    account_names = dict(db.session.execute(
+        select(Account.id, Account.name).where(Account.id.in_(list(points)))
+    ).all()) if points else {}
+    
+    return {
+        'uploads': [{'id': upload_id, 'uploaded_at': upload_dates[upload_id]} for upload_id in upload_ids],
+        'accounts': [
+            {
+                'account_id': key,
+                'account_name': account_names.get(key, ''),
+                **{
+                    field: [getattr(series[upload_id], field) if upload_id in series else 0
+                            for upload_id in upload_ids]
+                    for field in SNAPSHOT_FIELDS
+                }
+            }
+            for key, series in points.items()
+        ]
+    }
+
+def migrate_previous_snapshots():
+    """Re-key snapshots stored by account name onto account ids.
+    
+    upgrade_schema moves the name-keyed table aside; its rows are resolved
+    through the accounts table, spellings of one account summed, and the
+    old table dropped. Returns the number of snapshot rows written.
+    """
+    conn = db.session.connection()
+    name = previous_table_name(AccountSnapshot.__tablename__)
+    if not inspect(conn).has_table(name):
+        return 0
+    
+    previous = Table(name, MetaData(), autoload_with=conn)
+    rows = conn.execute(select(previous)).all()
+    account_ids = resolve_account_ids({row.account_name for row in rows})
+    totals = {}
+    for row in rows:
+        key = (row.upload_id, account_ids[row.account_name] or 0)
+        current = totals.setdefault(key, dict.fromkeys(SNAPSHOT_FIELDS, 0))
+        for field in SNAPSHOT_FIELDS:
+            current[field] += getattr(row, field)
+    
+    if totals:
+        db.session.execute(insert(AccountSnapshot), [
+            {'upload_id': upload_id, 'account_id': account_id, **values}
+            for (upload_id, account_id), values in totals.items()
+        ])
+    previous.drop(conn)
+    return len(totals)
@@ -0,0 +1,302 @@
+"""Parsing and validation rules for spread report CSVs.
+
+Nothing here imports the application or the database, so process pool
+workers can use the same rules as an upload without starting the app.
+"""
+import io
+import csv
+import hashlib
+from datetime import datetime
+
+# Accepted date formats, tried in order
+DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d', '%d-%m-%Y', '%m-%d-%Y']
+
+# Spread columns, the first non-empty one wins
+SPREAD_COLUMNS = ('Spread Amount', 'Weekly Spread', 'Spread')
+
+# Contractor attribute -> spread report column for plain text fields
+CSV_TEXT_COLUMNS = {
+    'talent_name': 'Talent Name',
+    'job_title': 'Job Title',
+    'candidate_status': 'Candidate Status',
+    'mobile': 'Mobile',
+    'recruiter': 'Recruiter',
+    'peoplesoft_id': 'Peoplesoft ID',
+    'account_manager': 'Account Manager',
+    'account_name': 'Account Name',
+    'opt_out_mobile': 'PrefCentre_Aerotek_OptOut_Mobile',
+}
+
+# Parsed fields that only overwrite stored values when the CSV value is valid
+CSV_OPTIONAL_COLUMNS = ('talent_start_date', 'talent_end_date', 'spread_amount', 'days_since_service')
+
+# Contractor attributes a report row can set, in row hash order
+CSV_VALUE_COLUMNS = ('talent_id', *CSV_TEXT_COLUMNS, *CSV_OPTIONAL_COLUMNS)
+
+# Messages for parsed values an upload would silently drop, by attribute
+VALUE_ERRORS = {
+    'talent_start_date': 'Unparseable date; the stored start date is kept',
+    'talent_end_date': 'Unparseable date; the stored end date is kept',
+    'spread_amount': 'Unparseable amount; the stored spread is kept',
+    'days_since_service': 'Not a whole number of days; the stored value is kept',
+}
+
+class QuoteParityError(ValueError):
+    """Record boundaries found by quote parity cannot be trusted for a report."""
+
+def parse_date(date_string):
+    """Parse date string in various formats."""
+    if not date_string or date_string.strip() == '':
+        return None
+    
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_string.strip(), fmt).date()
+        except ValueError:
+            continue
+    
+    return None
+
+def parse_decimal(value_string):
+    """Parse decimal values, handling various formats."""
+    if not value_string or value_string.strip() == '':
+        return None
+    
+    try:
+        # Remove currency symbols and commas
+        cleaned = value_string.replace('$', '').replace(',', '').strip()
+        return float(cleaned)
+    except (ValueError, AttributeError):
+        return None
+
+def map_distinct(raw, transform):
+    """Apply a vectorized transform to the distinct values of a Series only.
+    
+    Spread reports repeat the same dates, spreads, titles and accounts over
+    many rows, so the column is factorized, ``transform`` runs once per
+    distinct value and the results are broadcast back by code.
+    """
+    import numpy as np
+    import pandas as pd
+    codes, uniques = pd.factorize(raw, use_na_sentinel=False)
+    if len(uniques) * 2 > len(raw):
+        # Mostly distinct values (names, IDs): broadcasting would not pay off
+        return pd.Series(np.asarray(transform(raw), dtype=object), index=raw.index)
+    transformed = transform(pd.Series(uniques, dtype=object))
+    return pd.Series(np.asarray(transformed, dtype=object)[codes], index=raw.index)
+
+def normalize_text(raw):
+    """Vectorized ``str.strip`` over a Series of strings."""
+    return map_distinct(raw, lambda values: values.str.strip())
+
+def parse_dates(values):
+    """Parse a Series of date strings with the parse_date rules.
+    
+    Values are bucketed by shape so each DATE_FORMATS entry only sees strings
+    it could match, which keeps the precedence of parse_date. Anything left
+    unparsed (including dates pandas cannot represent) goes through parse_date.
+    """
+    import pandas as pd
+    text = values.str.strip()
+    present = text != ''
+    slashed = present & text.str.contains('/', regex=False)
+    iso = present & ~slashed & text.str.match(r'\d{4}-')
+    dashed = present & ~slashed & ~iso
+    
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[us]')
+    for bucket, fmt in ((slashed, DATE_FORMATS[0]), (iso, DATE_FORMATS[1]),
+                        (dashed, DATE_FORMATS[2]), (dashed, DATE_FORMATS[3])):
+        pending = bucket & parsed.isna()
+        if pending.any():
+            parsed[pending] = pd.to_datetime(text[pending], format=fmt, errors='coerce')
+    
+    dates = parsed.dt.date.astype(object).where(parsed.notna(), None)
+    leftover = present & parsed.isna()
+    if leftover.any():
+        dates[leftover] = text[leftover].map(parse_date)
+    return dates
+
+def parse_decimals(values):
+    """Parse a Series of amounts with the parse_decimal rules (None if invalid)."""
+    import pandas as pd
+    cleaned = values.str.replace('$', '', regex=False).str.replace(',', '', regex=False).str.strip()
+    amounts = pd.to_numeric(cleaned.where(cleaned != ''), errors='coerce')
+    return amounts.astype(object).where(amounts.notna(), None)
+
+def parse_day_counts(values):
+    """Parse a Series of Days Since Service values (None unless all digits)."""
+    import pandas as pd
+    text = values.str.strip()
+    days = pd.to_numeric(text.where(text.str.isdigit()), errors='coerce').astype('Int64')
+    return days.astype(object).where(days.notna(), None)
+
+def spread_text(frame):
+    """The raw spread of each row: the first non-empty SPREAD_COLUMNS value."""
+    import pandas as pd
+    spread_raw = pd.Series('', index=frame.index, dtype=object)
+    for column in reversed(SPREAD_COLUMNS):
+        if column in frame:
+            spread_raw = frame[column].where(frame[column] != '', spread_raw)
+    return spread_raw
+
+def normalize_spread_frame(frame):
+    """Normalize a frame of raw spread report text into typed Contractor columns.
+    
+    This is the whole-frame equivalent of contractor_values_from_csv: text
+    columns are trimmed, dates and spreads parsed with the parse_date and
+    parse_decimal rules, and Days Since Service kept only when numeric.
+    Returns a dict of column arrays keyed by Contractor attribute.
+    """
+    import numpy as np
+    missing = np.full(len(frame), None, dtype=object)
+    columns = {}
+    for attr, column in CSV_TEXT_COLUMNS.items():
+        if column in frame:
+            columns[attr] = normalize_text(frame[column]).to_numpy()
+    
+    if 'Talent ID' in frame:
+        talent_ids = frame['Talent ID'].str.strip()
+        columns['talent_id'] = talent_ids.where(talent_ids != '', None).to_numpy()
+    else:
+        columns['talent_id'] = missing
+    
+    for attr, column in (('talent_start_date', 'Talent Start Date'), ('talent_end_date', 'Talent End Date')):
+        if column in frame:
+            columns[attr] = map_distinct(frame[column], parse_dates).to_numpy()
+        else:
+            columns[attr] = missing
+    
+    columns['spread_amount'] = map_distinct(spread_text(frame), parse_decimals).to_numpy()
+    
+    if 'Days Since Service' in frame:
+        columns['days_since_service'] = map_distinct(frame['Days Since Service'], parse_day_counts).to_numpy()
+    else:
+        columns['days_since_service'] = missing
+    
+    return columns
+
+def column_arrays_to_values(columns):
+    """Turn column arrays from normalize_spread_frame into per-row value dicts."""
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(columns[name] for name in names))]
+
+def contractor_values_from_csv(row):
+    """Extract normalized Contractor column values from a CSV row.
+    
+    Text columns that are absent from the report are left out so callers can
+    either apply a default (new contractors) or keep the stored value (updates).
+    Unparseable dates, spreads and day counts come back as None.
+    """
+    values = {}
+    for attr, column in CSV_TEXT_COLUMNS.items():
+        if column in row:
+            values[attr] = (row[column] or '').strip()
+    
+    values['talent_id'] = (row.get('Talent ID') or '').strip() or None
+    values['talent_start_date'] = parse_date(row.get('Talent Start Date', ''))
+    values['talent_end_date'] = parse_date(row.get('Talent End Date', ''))
+    values['spread_amount'] = parse_decimal(row.get('Spread Amount', '') or row.get('Weekly Spread', '') or row.get('Spread', ''))
+    
+    days_since = (row.get('Days Since Service') or '').strip()
+    values['days_since_service'] = int(days_since) if days_since.isdigit() else None
+    
+    return values
+
+def contractor_values_hash(values):
+    """Digest the normalized values of one report row for change detection.
+    
+    Text columns missing from the report hash differently from empty ones,
+    so a report that drops a column is not mistaken for an unchanged one.
+    """
+    payload = repr(tuple((attr in values, values.get(attr)) for attr in CSV_VALUE_COLUMNS))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+def contractor_column_hashes(columns):
+    """contractor_values_hash of every row of normalize_spread_frame columns.
+    
+    Each distinct value of a column is repr'd once and the row payloads are
+    joined from those pieces, giving the same digests several times faster
+    than building and repr'ing a tuple per row.
+    """
+    rows = len(columns['talent_id'])
+    pieces = []
+    for attr in CSV_VALUE_COLUMNS:
+        if attr not in columns:
+            pieces.append([repr((False, None))] * rows)
+            continue
+        reprs = {}
+        column_pieces = []
+        for value in columns[attr]:
+            key = (value.__class__, value)
+            piece = reprs.get(key)
+            if piece is None:
+                piece = reprs[key] = repr((True, value))
+            column_pieces.append(piece)
+        pieces.append(column_pieces)
+    return [hashlib.blake2b(f"({', '.join(row)})".encode(), digest_size=16).hexdigest() for row in zip(*pieces)]
+
+def validate_report_block(header, block, max_errors):
+    """Check a block of raw CSV records, without the header, the way an upload reads them."""
+    # A cut that landed inside a quoted field leaves the block ending mid-field
+    try:
+        records = list(csv.reader(io.StringIO(block.decode('utf-8'), newline=''), strict=True))
+    except csv.Error as e:
+        raise QuoteParityError(f'Block does not hold whole records: {e}')
+    return validate_report_records(header, records, max_errors)
+
+def validate_report_records(header, records, max_errors):
+    """Check parsed spread report records the way an upload reads them, listing at most ``max_errors`` errors."""
+    import numpy as np
+    import pandas as pd
+    width = len(header)
+    positions = [position for position, row in enumerate(records) if row]
+    rows = [records[position] for position in positions]
+    
+    errors = []
+    for position, row in zip(positions, rows):
+        if len(row) > width:
+            errors.append((position, '', '', f'{len(row)} cells but the header has {width}; the extra cells are ignored'))
+    
+    frame = pd.DataFrame([row if len(row) == width else (row + [''] * width)[:width] for row in rows],
+                         columns=header, dtype=object)
+    if 'Talent Name' in frame:
+        named = (frame['Talent Name'].str.strip() != '').to_numpy()
+    else:
+        named = np.zeros(len(frame), dtype=bool)
+    for index in np.flatnonzero(~named):
+        errors.append((positions[index], 'Talent Name', '', 'Missing Talent Name; the row is skipped'))
+    
+    frame = frame[named]
+    row_indexes = frame.index.to_numpy()
+    columns = normalize_spread_frame(frame)
+    
+    # (attribute, report column, raw text) of every parsed value
+    checks = [(attr, column, frame[column])
+              for attr, column in (('talent_start_date', 'Talent Start Date'), ('talent_end_date', 'Talent End Date'),
+                                   ('days_since_service', 'Days Since Service'))
+              if column in frame]
+    spread_columns = [column for column in SPREAD_COLUMNS if column in frame]
+    if spread_columns:
+        checks.append(('spread_amount', spread_columns[0], spread_text(frame)))
+    for attr, column, raw in checks:
+        invalid = (raw.str.strip() != '').to_numpy() & pd.isna(columns[attr])
+        for index in np.flatnonzero(invalid):
+            errors.append((positions[row_indexes[index]], column, raw.iat[index], VALUE_ERRORS[attr]))
+    
+    errors.sort(key=lambda error: error[0])
+    counts = {}
+    for error in errors:
+        counts[error[1]] = counts.get(error[1], 0) + 1
+    return {
+        'records': len(records),
+        'rows': len(rows),
+        'skipped': int(len(named) - named.sum()),
+        'invalid_rows': len({error[0] for error in errors}),
+        'error_counts': counts,
+        'errors': errors[:max_errors],
+        'talent_ids': columns['talent_id'].tolist(),
+        'row_hashes': contractor_column_hashes(columns),
+        # Record offsets within ``records``, and non-blank row numbers as upload chunks count them
+        'positions': [positions[index] for index in row_indexes],
+        'row_indexes': row_indexes.tolist(),
+    }
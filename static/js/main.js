@@ -187,21 +187,140 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
-    // Auto-refresh for dashboard (every 5 minutes)
-    if (window.location.pathname === '/' || window.location.pathname.includes('/dashboard')) {
-        setInterval(function() {
-            // Only refresh if the page is visible
-            if (!document.hidden) {
-                const refreshIndicator = document.createElement('div');
-                refreshIndicator.className = 'position-fixed top-0 end-0 m-3 alert alert-info alert-sm';
-                refreshIndicator.innerHTML = '<i data-feather="refresh-cw" class="spinner me-1"></i>Updating...';
-                refreshIndicator.style.zIndex = '9999';
-                document.body.appendChild(refreshIndicator);
-                
-                // Refresh the page
-                setTimeout(() => window.location.reload(), 1000);
+    // Keep the dashboard current: poll /api/dashboard with the last ETag
+    // (a cheap 304 while nothing changed) and patch only the changed widgets
+    const dashboard = document.getElementById('dashboard');
+    if (dashboard) {
+        let etag = `"${dashboard.dataset.etag}"`;
+        let previous = null;
+        
+        const escapeHtml = text => String(text ?? '').replace(/[&<>"']/g, c => ({
+            '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+        }[c]));
+        const money = (value, digits = 2) => '$' + Number(value || 0).toFixed(digits);
+        const formatters = {
+            money: value => money(value),
+            percent: value => Number(value || 0).toFixed(1) + '%'
+        };
+        // ISO dates and times as the server-rendered template shows them
+        const formatDate = (iso, withYear) => {
+            const [year, month, day] = iso.slice(0, 10).split('-');
+            return withYear ? `${month}/${day}/${year}` : `${month}/${day}`;
+        };
+        const formatDateTime = iso => {
+            const [hours, minutes] = iso.slice(11, 16).split(':').map(Number);
+            const hour12 = String(hours % 12 || 12).padStart(2, '0');
+            return `${formatDate(iso, true)} ${hour12}:${String(minutes).padStart(2, '0')} ${hours < 12 ? 'AM' : 'PM'}`;
+        };
+        
+        const widgets = {
+            'dashboard-falling-off': {
+                fields: ['falling_off_count', 'spread_falling_off', 'quarter_end', 'falling_off_this_quarter'],
+                render: data => {
+                    let html = '<h6 class="text-warning">Contracts Ending This Quarter</h6>';
+                    if (!data.falling_off_count) {
+                        return html + '<p class="text-success">No contracts ending this quarter!</p>';
+                    }
+                    html += `<p class="mb-2"><strong>${data.falling_off_count}</strong> contractors ending by ${formatDate(data.quarter_end, true)}</p>`;
+                    html += `<p class="mb-2">Spread Loss: <span class="text-danger"><strong>-${money(data.spread_falling_off)}</strong></span></p>`;
+                    html += '<div class="mt-3">';
+                    data.falling_off_this_quarter.forEach(contractor => {
+                        html += `<div class="d-flex justify-content-between border-bottom py-1">
+                            <span class="small">${escapeHtml(contractor.talent_name)}</span>
+                            <span class="small text-warning">${formatDate(contractor.talent_end_date)}</span>
+                        </div>`;
+                    });
+                    if (data.falling_off_count > 5) {
+                        html += `<div class="text-center mt-2"><small class="text-muted">and ${data.falling_off_count - 5} more...</small></div>`;
+                    }
+                    return html + '</div>';
+                }
+            },
+            'dashboard-top-clients': {
+                fields: ['client_distribution'],
+                render: data => {
+                    if (!data.client_distribution.length) {
+                        return '<p class="text-muted small">No client data available</p>';
+                    }
+                    return data.client_distribution.map(client => `
+                        <div class="d-flex justify-content-between border-bottom py-1">
+                            <span class="small">${escapeHtml(client.account_name || 'Unknown')}</span>
+                            <span class="small">
+                                <span class="badge bg-primary">${client.contractor_count}</span>
+                                ${money(client.total_spread, 0)}
+                            </span>
+                        </div>`).join('');
+                }
+            },
+            'dashboard-recent-uploads': {
+                fields: ['recent_uploads'],
+                render: data => {
+                    if (!data.recent_uploads.length) {
+                        return `<div class="text-center py-4">
+                            <i data-feather="upload" class="text-muted mb-3" style="width: 32px; height: 32px;"></i>
+                            <p class="text-muted small">No uploads yet.</p>
+                            <a href="${document.getElementById('dashboard-recent-uploads').dataset.uploadUrl}" class="btn btn-sm btn-primary">Upload CSV</a>
+                        </div>`;
+                    }
+                    return data.recent_uploads.map(upload => {
+                        const running = upload.status === 'queued' || upload.status === 'processing';
+                        let icon = '<i data-feather="x-circle" class="text-danger"></i>';
+                        let detail = `Failed: ${escapeHtml((upload.error_message || '').slice(0, 50))}...`;
+                        if (upload.status === 'completed') {
+                            icon = '<i data-feather="check-circle" class="text-success"></i>';
+                            detail = `${upload.records_processed} records processed`;
+                        } else if (running) {
+                            icon = '<i data-feather="loader" class="text-info"></i>';
+                            detail = `Processing: ${upload.records_processed} records so far`;
+                        }
+                        return `<div class="d-flex align-items-center mb-3">
+                            <div class="flex-shrink-0">${icon}</div>
+                            <div class="flex-grow-1 ms-3">
+                                <div class="small font-weight-bold">${escapeHtml(upload.filename)}</div>
+                                <div class="small text-muted">${formatDateTime(upload.uploaded_at)}<br>${detail}</div>
+                            </div>
+                        </div>`;
+                    }).join('');
+                }
             }
-        }, 300000); // 5 minutes
+        };
+        
+        const patchDashboard = function(data) {
+            dashboard.querySelectorAll('[data-dashboard-field]').forEach(function(element) {
+                const format = formatters[element.dataset.format] || String;
+                const text = format(data[element.dataset.dashboardField]);
+                if (element.textContent !== text) {
+                    element.textContent = text;
+                }
+            });
+            
+            Object.entries(widgets).forEach(function([id, widget]) {
+                const slice = data => JSON.stringify(widget.fields.map(field => data[field]));
+                if (previous === null || slice(previous) !== slice(data)) {
+                    document.getElementById(id).innerHTML = widget.render(data);
+                }
+            });
+            previous = data;
+            feather.replace();
+        };
+        
+        const refresh = function() {
+            // Only poll while the tab is visible
+            if (document.hidden) {
+                return;
+            }
+            fetch(dashboard.dataset.apiUrl, { headers: { 'Accept': 'application/json', 'If-None-Match': etag } })
+                .then(response => {
+                    if (response.status !== 200) {
+                        return;  // 304: nothing changed
+                    }
+                    etag = response.headers.get('ETag') || etag;
+                    return response.json().then(patchDashboard);
+                })
+                .catch(() => {});
+        };
+        setInterval(refresh, 60000); // 1 minute
+        document.addEventListener('visibilitychange', refresh);
     }
 
     // Add keyboard shortcuts
@@ -0,0 +1,39 @@
+import os
+import tempfile
+import pytest
+
+# The app reads its configuration on import, so point it at a scratch database first
+DATABASE_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DATABASE_DIR, 'test.db')}"
+os.environ.setdefault('SESSION_SECRET', 'test')
+os.environ['INIT_DB_ON_STARTUP'] = '1'
+
+from sqlalchemy import text
+from app import app as flask_app, db
+from models import User
+from aggregates import rebuild_dashboard_aggregates
+from search import install_search_index
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, UPLOAD_FOLDER=os.path.join(DATABASE_DIR, 'uploads'))
+    with flask_app.app_context():
+        db.drop_all()
+        # The search index is not a model, so drop_all leaves it behind without its triggers
+        db.session.execute(text('DROP TABLE IF EXISTS contractors_fts'))
+        db.session.commit()
+        db.create_all()
+        flask_app.config['SEARCH_BACKEND'] = install_search_index(db.engine)
+        user = User(email='tester@example.com', first_name='Test', last_name='User', onboarding_completed=True)
+        user.set_password('secret1')
+        db.session.add(user)
+        rebuild_dashboard_aggregates()
+        db.session.commit()
+    flask_app.extensions['analytics_cache'].clear()
+    yield flask_app
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'email': 'tester@example.com', 'password': 'secret1'})
+    return client
@@ -0,0 +1,77 @@
+from datetime import date
+from sqlalchemy import text
+from app import db
+from models import AccountSnapshot, Contractor, DashboardAggregate, UploadHistory, User
+from accounts import resolve_account_ids
+from aggregates import get_dashboard_aggregates
+from migrations import upgrade_schema
+from reports import compute_analytics
+from snapshots import record_account_snapshot, migrate_previous_snapshots
+
+def test_client_stats_count_contractors_without_an_account(app):
+    with app.app_context():
+        user = User.query.first()
+        account_id = resolve_account_ids(['Acme'])['Acme']
+        db.session.add_all([
+            Contractor(talent_name='Ada', candidate_status='Current', spread_amount=10,
+                       account_name='Acme', account_id=account_id, created_by=user.id),
+            Contractor(talent_name='Bob', candidate_status='Current', spread_amount=5, created_by=user.id),
+        ])
+        db.session.commit()
+        
+        stats = {row['account_name']: row for row in compute_analytics(date.today())['client_stats']}
+    
+    assert stats['Acme']['total_contractors'] == 1
+    assert stats['']['total_contractors'] == 1
+    assert stats['']['active_contractors'] == 1
+
+def test_trends_follow_the_account_whatever_its_spelling(app, client):
+    with app.app_context():
+        user = User.query.first()
+        account_id = resolve_account_ids(['Acme Inc'])['Acme Inc']
+        db.session.add(Contractor(talent_name='Ada', candidate_status='Current', spread_amount=10,
+                                  account_name='Acme Inc', account_id=account_id, created_by=user.id))
+        for _ in range(2):
+            upload = UploadHistory(filename='report.csv')
+            db.session.add(upload)
+            db.session.flush()
+            record_account_snapshot(upload.id)
+        db.session.commit()
+    
+    trends = client.get('/analytics/trends?account=ACME inc.').get_json()
+    assert [(series['account_name'], series['active_count']) for series in trends['accounts']] == [('Acme Inc', [1, 1])]
+    assert client.get('/analytics/trends?account=Initech').get_json() == {'uploads': [], 'accounts': []}
+
+def test_dashboard_skips_client_buckets_keyed_by_name(app):
+    with app.app_context():
+        db.session.add(DashboardAggregate(metric='client', bucket='Acme Inc', count=3, total=30))
+        db.session.commit()
+        
+        aggregates = get_dashboard_aggregates(date.today(), date.today())
+    assert aggregates['client_distribution'] == []
+
+def test_name_keyed_snapshots_are_rekeyed_by_account(app):
+    with app.app_context():
+        upload = UploadHistory(filename='report.csv')
+        db.session.add(upload)
+        db.session.commit()
+        
+        # The layout snapshots had before accounts existed
+        AccountSnapshot.__table__.drop(db.engine)
+        with db.engine.begin() as conn:
+            conn.execute(text('CREATE TABLE account_snapshots (upload_id INTEGER NOT NULL, account_name VARCHAR(200) NOT NULL, '
+                              'contractor_count INTEGER NOT NULL, active_count INTEGER NOT NULL, '
+                              'total_spread NUMERIC(14, 2) NOT NULL, active_spread NUMERIC(14, 2) NOT NULL, '
+                              'PRIMARY KEY (upload_id, account_name))'))
+            conn.execute(text('INSERT INTO account_snapshots VALUES '
+                              f"({upload.id}, 'Acme Inc', 2, 1, 20, 10), ({upload.id}, 'ACME INC.', 1, 1, 5, 5), "
+                              f"({upload.id}, '', 4, 0, 8, 0)"))
+        
+        assert ('account_snapshots', 'account_id') in upgrade_schema(db.engine, db.metadata)
+        assert migrate_previous_snapshots() == 2
+        db.session.commit()
+        
+        rows = {row.account_id: (row.contractor_count, row.active_count, row.total_spread) for row in AccountSnapshot.query}
+        account_id = resolve_account_ids(['Acme Inc'])['Acme Inc']
+        assert rows == {account_id: (3, 2, 25), 0: (4, 0, 8)}
+        assert migrate_previous_snapshots() == 0
@@ -0,0 +1,41 @@
+from app import db
+from models import Contractor, User
+from aggregates import rebuild_dashboard_aggregates
+
+def add_contractors(count, status):
+    user = User.query.first()
+    db.session.add_all([
+        Contractor(talent_name=f'Contractor {n}', talent_id=f'T{n}', candidate_status=status, created_by=user.id)
+        for n in range(count)
+    ])
+    rebuild_dashboard_aggregates()
+    db.session.commit()
+
+def test_filtered_count_follows_status_change(app, client):
+    with app.app_context():
+        add_contractors(22, 'Pending')
+        contractor_id = Contractor.query.first().id
+    
+    page = client.get('/contractors/?status=Pending').get_data(as_text=True)
+    assert '22 contractors' in page
+    
+    response = client.post(f'/contractors/{contractor_id}/edit', data={
+        'talent_name': 'Contractor 0',
+        'talent_id': 'T0',
+        'candidate_status': 'Inactive'
+    })
+    assert response.status_code == 302
+    
+    page = client.get('/contractors/?status=Pending').get_data(as_text=True)
+    assert '21 contractors' in page
+
+def test_search_finds_contractors_added_in_the_test(app, client):
+    with app.app_context():
+        add_contractors(3, 'Current')
+        contractor = Contractor.query.first()
+        contractor.talent_name = 'Zelda Forklift'
+        db.session.commit()
+    
+    page = client.get('/contractors/?search=Zelda').get_data(as_text=True)
+    assert 'Zelda Forklift' in page
+    assert 'Contractor 1' not in page
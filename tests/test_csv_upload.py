@@ -0,0 +1,121 @@
+import io
+import pytest
+from werkzeug.datastructures import FileStorage
+from models import Contractor, ReviewQueue, UploadHistory, UploadStaging, User
+from aggregates import get_pending_reviews_count
+from utils import process_csv_upload
+
+HEADER = 'Talent Name,Talent ID,Candidate Status,Account Name,Spread Amount\n'
+
+def upload(rows, **options):
+    """Run a report made of ``rows`` CSV lines through process_csv_upload and return its stats."""
+    report = FileStorage(io.BytesIO((HEADER + ''.join(line + '\n' for line in rows)).encode()), filename='report.csv')
+    return process_csv_upload(report, User.query.first().id, **options)
+
+def contractors():
+    return {contractor.talent_id: contractor for contractor in Contractor.query}
+
+def test_second_upload_adds_and_updates_in_bulk(app):
+    with app.app_context():
+        stats = upload(['Ada,T1,Current,Acme,10', 'Grace,T2,Current,Acme,20', 'Linus,T3,Current,Initech,30'])
+        assert (stats['processed'], stats['added'], stats['updated']) == (3, 3, 0)
+        
+        stats = upload(['Ada,T1,Current,Acme,15', 'Grace,T2,Pending,Acme,20', 'Linus,T3,Current,Initech,30',
+                        'Alan,T4,Current,Initech,40', 'Alan T.,T4,Current,Initech,45'])
+        assert (stats['processed'], stats['added'], stats['updated'], stats['unchanged']) == (5, 1, 3, 1)
+        
+        stored = contractors()
+        assert len(stored) == 4
+        assert stored['T1'].spread_amount == 15
+        assert stored['T2'].candidate_status == 'Pending'
+        # The later row for a repeated Talent ID wins
+        assert (stored['T4'].talent_name, stored['T4'].spread_amount) == ('Alan T.', 45)
+        assert stored['T1'].account_id == stored['T2'].account_id != stored['T3'].account_id
+        
+        history = UploadHistory.query.order_by(UploadHistory.id.desc()).first()
+        assert history.status == 'completed'
+        assert (history.records_processed, history.records_added, history.records_updated) == (5, 1, 3)
+
+def test_unparseable_amount_keeps_the_stored_spread(app):
+    with app.app_context():
+        upload(['Ada,T1,Current,Acme,10'])
+        stats = upload(['Ada,T1,Current,Acme,ten'])
+        assert stats['updated'] == 1
+        assert contractors()['T1'].spread_amount == 10
+
+# Rows crossing every chunk boundary: a repeated Talent ID, a blank name and rows without an ID
+CHUNKED_REPORT = ['Ada,T1,Current,Acme,10', 'Grace,T2,Current,Acme,20', ',T9,Current,Acme,5',
+                  'Ada L.,T1,Current,Acme,11', 'Linus,,Current,Initech,30', 'Alan,T4,Pending,Initech,40',
+                  'Linus,,Current,Initech,30']
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 1000])
+def test_chunk_boundaries_do_not_change_the_result(app, chunk_size):
+    with app.app_context():
+        first = upload(CHUNKED_REPORT, chunk_size=chunk_size)
+        second = upload(CHUNKED_REPORT, chunk_size=chunk_size)
+        
+        assert first == {'processed': 7, 'added': 5, 'updated': 1, 'unchanged': 0, 'queued': 0}
+        assert second == {'processed': 7, 'added': 2, 'updated': 2, 'unchanged': 2, 'queued': 0}
+        assert sorted((c.talent_id or '', c.talent_name, c.spread_amount) for c in Contractor.query) == [
+            ('', 'Linus', 30), ('', 'Linus', 30), ('', 'Linus', 30), ('', 'Linus', 30),
+            ('T1', 'Ada L.', 11), ('T2', 'Grace', 20), ('T4', 'Alan', 40)
+        ]
+        
+        history = UploadHistory.query.order_by(UploadHistory.id.desc()).first()
+        assert history.chunks_processed == -(-len(CHUNKED_REPORT) // chunk_size)
+        assert history.records_processed == 7
+
+def test_each_chunk_is_committed_as_it_goes(app, monkeypatch):
+    import utils
+    write_batch = utils.upsert_contractor_batch
+    calls = []
+    
+    def fail_second_chunk(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError('database went away')
+        return write_batch(*args, **kwargs)
+    
+    monkeypatch.setattr(utils, 'upsert_contractor_batch', fail_second_chunk)
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            upload(['Ada,T1,Current,Acme,10', 'Grace,T2,Current,Acme,20', 'Alan,T4,Current,Acme,40'], chunk_size=2)
+        
+        history = UploadHistory.query.one()
+        assert (history.status, history.chunks_processed, history.records_added) == ('failed', 1, 2)
+        assert set(contractors()) == {'T1', 'T2'}
+
+def test_missing_contractors_are_queued_once(app):
+    with app.app_context():
+        upload(['Ada,T1,Current,Acme,10', 'Grace,T2,Current,Acme,20', 'Linus,T3,Pending,Acme,30',
+                'Alan,T4,Current,Acme,40'])
+        
+        # T2 and T4 drop out; T3 is not Current, so it is never queued
+        assert upload(['Ada,T1,Current,Acme,10'], chunk_size=1)['queued'] == 2
+        # Still missing but already waiting for review: nothing new is queued
+        assert upload(['Ada,T1,Current,Acme,10', 'Alan,T4,Current,Acme,40'])['queued'] == 0
+        
+        queued = ReviewQueue.query.filter_by(reviewed=False).all()
+        assert sorted(review.contractor.talent_id for review in queued) == ['T2', 'T4']
+        assert {review.upload_id for review in queued} == {UploadHistory.query.order_by(UploadHistory.id).all()[1].id}
+        assert get_pending_reviews_count() == 2
+        assert UploadStaging.query.count() == 0
+
+def test_unchanged_rows_are_not_written(app, client):
+    report = ['Ada,T1,Current,Acme,10', 'Grace,T2,Current,Acme,20']
+    with app.app_context():
+        upload(report)
+        written_at = {talent_id: contractor.updated_at for talent_id, contractor in contractors().items()}
+        
+        assert upload(report)['unchanged'] == 2
+        assert {talent_id: contractor.updated_at for talent_id, contractor in contractors().items()} == written_at
+        assert UploadHistory.query.order_by(UploadHistory.id.desc()).first().records_unchanged == 2
+        contractor_id = contractors()['T1'].id
+    
+    # An edit in the app clears the stored hash, so the next upload writes the report values back
+    client.post(f'/contractors/{contractor_id}/edit', data={'talent_name': 'Ada', 'talent_id': 'T1',
+                                                           'candidate_status': 'Inactive', 'spread_amount': '10'})
+    with app.app_context():
+        stats = upload(report)
+        assert (stats['updated'], stats['unchanged']) == (1, 1)
+        assert contractors()['T1'].candidate_status == 'Current'
@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+from app import db
+from models import Contractor, User
+from aggregates import rebuild_dashboard_aggregates
+
+def test_dashboard_etag_changes_when_a_contractor_is_renamed(app, client):
+    with app.app_context():
+        contractor = Contractor(talent_name='Ada', talent_id='T1', candidate_status='Current', spread_amount=50,
+                                talent_end_date=date.today() + timedelta(days=1), created_by=User.query.first().id)
+        db.session.add(contractor)
+        rebuild_dashboard_aggregates()
+        db.session.commit()
+        contractor_id = contractor.id
+    
+    etag = client.get('/api/dashboard').headers['ETag']
+    assert client.get('/api/dashboard', headers={'If-None-Match': etag}).status_code == 304
+    
+    client.post(f'/contractors/{contractor_id}/edit', data={
+        'talent_name': 'Ada Lovelace',
+        'talent_id': 'T1',
+        'candidate_status': 'Current',
+        'spread_amount': '50',
+        'talent_end_date': (date.today() + timedelta(days=1)).isoformat()
+    })
+    
+    response = client.get('/api/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Ada Lovelace' in response.get_data(as_text=True)
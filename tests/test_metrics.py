@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app import create_app
+
+def test_queries_counted_once_with_two_apps(app, client):
+    create_app()
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(Engine, 'after_cursor_execute', record)
+    try:
+        response = client.get('/contractors/')
+    finally:
+        event.remove(Engine, 'after_cursor_execute', record)
+    
+    assert response.status_code == 200
+    assert int(response.headers['X-Query-Count']) == len(statements)
+
+def test_failed_request_is_recorded(app, client, monkeypatch):
+    def fail(search, status):
+        raise RuntimeError('listing failed')
+    
+    # Under TESTING the error propagates and after_request never runs
+    monkeypatch.setattr('routes.contractor_listing_query', fail)
+    with pytest.raises(RuntimeError):
+        client.get('/contractors/')
+    
+    assert app.extensions['metrics'].requests[('contractors.list_contractors', 'GET', 500)] == 1
@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+import pytest
+from app import db
+from models import Contractor, ReviewQueue, UploadHistory, User
+from aggregates import rebuild_dashboard_aggregates
+from query_budget import ENDPOINT_QUERY_BUDGETS
+
+# Page URLs by endpoint, given the id of a seeded contractor
+PAGES = {
+    'main.dashboard': lambda contractor_id: '/dashboard',
+    'main.dashboard_api': lambda contractor_id: '/api/dashboard',
+    'main.review_queue': lambda contractor_id: '/review-queue',
+    'contractors.list_contractors': lambda contractor_id: '/contractors/',
+    'contractors.view_contractor': lambda contractor_id: f'/contractors/{contractor_id}',
+}
+
+def seed(rows, start=0):
+    """Add ``rows`` contractors, each with an open review and an upload, spread over a few users."""
+    users = [User(email=f'user{start}-{n}@example.com', first_name='User', last_name=str(n)) for n in range(3)]
+    for user in users:
+        user.set_password('secret1')
+    db.session.add_all(users)
+    db.session.flush()
+    
+    today = date.today()
+    contractors = [
+        Contractor(talent_name=f'Contractor {n}', talent_id=f'T{n}', candidate_status='Current', spread_amount=n + 1,
+                   account_name=f'Account {n % 4}', talent_end_date=today + timedelta(days=n % 30),
+                   created_by=users[n % len(users)].id)
+        for n in range(start, start + rows)
+    ]
+    db.session.add_all(contractors)
+    db.session.add_all([UploadHistory(filename=f'report{n}.csv', uploaded_by=users[n % len(users)].id) for n in range(start, start + rows)])
+    db.session.flush()
+    db.session.add_all([ReviewQueue(contractor_id=contractor.id, reason='Not in latest upload', added_by=users[n % len(users)].id)
+                        for n, contractor in enumerate(contractors)])
+    rebuild_dashboard_aggregates()
+    db.session.commit()
+    return contractors[0].id
+
+def test_every_budgeted_page_is_checked():
+    assert set(PAGES) == set(ENDPOINT_QUERY_BUDGETS)
+
+@pytest.mark.parametrize('rows', [1, 40])
+@pytest.mark.parametrize('endpoint', sorted(PAGES))
+def test_page_stays_within_its_query_budget(app, client, endpoint, rows):
+    with app.app_context():
+        contractor_id = seed(rows)
+    
+    response = client.get(PAGES[endpoint](contractor_id))
+    assert response.status_code == 200
+    assert int(response.headers['X-Query-Count']) <= ENDPOINT_QUERY_BUDGETS[endpoint]
+
+@pytest.mark.parametrize('endpoint', sorted(PAGES))
+def test_query_count_does_not_grow_with_rows(app, client, endpoint):
+    with app.app_context():
+        contractor_id = seed(1)
+    first = int(client.get(PAGES[endpoint](contractor_id)).headers['X-Query-Count'])
+    
+    with app.app_context():
+        seed(39, start=1)
+    app.extensions['analytics_cache'].clear()
+    assert int(client.get(PAGES[endpoint](contractor_id)).headers['X-Query-Count']) == first
@@ -0,0 +1,33 @@
+import io
+from datetime import date, timedelta
+from werkzeug.datastructures import FileStorage
+from app import db
+from models import Contractor, ReviewQueue, UploadHistory, AccountSnapshot, User
+from migrations import analyze_tables
+from query_plans import check_query_plans
+from utils import process_csv_upload
+
+STATUSES = ('Current', 'Current', 'Current', 'Pending', 'Inactive')
+
+def spread_report(rows):
+    today = date.today()
+    lines = ['Talent Name,Talent ID,Candidate Status,Account Name,Talent End Date,Spread Amount']
+    for n in range(rows):
+        end_date = today + timedelta(days=n % 200 - 20)
+        lines.append(f'Contractor {n},T{n},{STATUSES[n % len(STATUSES)]},Account {n % 25},{end_date:%m/%d/%Y},{n % 90 + 10}')
+    return FileStorage(io.BytesIO('\n'.join(lines).encode()), filename='report.csv')
+
+def test_hot_queries_are_served_by_indexes(app):
+    with app.app_context():
+        user_id = User.query.first().id
+        process_csv_upload(spread_report(600), user_id)
+        # The second report drops contractors, so review items get queued
+        process_csv_upload(spread_report(500), user_id)
+        analyze_tables(db.session.connection(), [Contractor.__table__, ReviewQueue.__table__,
+                                                 UploadHistory.__table__, AccountSnapshot.__table__])
+        db.session.commit()
+        # SQLite connections keep the statistics they loaded; plan on fresh ones, as the CLI does
+        db.engine.dispose()
+        
+        assert ReviewQueue.query.count() > 0
+        assert check_query_plans() == []
@@ -0,0 +1,43 @@
+import pytest
+from app import db
+from models import Contractor, ReviewQueue, User
+from aggregates import rebuild_dashboard_aggregates
+
+def queue_contractors(count):
+    user = User.query.first()
+    contractors = [Contractor(talent_name=f'Contractor {n}', talent_id=f'T{n}', created_by=user.id) for n in range(count)]
+    db.session.add_all(contractors)
+    db.session.flush()
+    db.session.add_all([ReviewQueue(contractor_id=contractor.id, reason='Not in latest upload') for contractor in contractors])
+    rebuild_dashboard_aggregates()
+    db.session.commit()
+    return [review.id for review in ReviewQueue.query.order_by(ReviewQueue.id)]
+
+@pytest.mark.parametrize('body', [[], 'remove', 3, {'action': 'keep', 'review_ids': '12'}])
+def test_bulk_action_rejects_malformed_json(client, body):
+    response = client.post('/review-queue/bulk', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_bulk_action_rejects_form_posts(app, client):
+    with app.app_context():
+        review_ids = queue_contractors(2)
+    
+    response = client.post('/review-queue/bulk', data={'action': 'remove', 'review_ids': review_ids, 'all': '1'})
+    assert response.status_code == 400
+    
+    with app.app_context():
+        assert ReviewQueue.query.filter_by(reviewed=False).count() == 2
+        assert Contractor.query.filter_by(candidate_status='Inactive').count() == 0
+
+def test_bulk_action_only_touches_the_listed_items(app, client):
+    # The last item stands in for one queued by an upload after the page was rendered
+    with app.app_context():
+        listed = queue_contractors(3)[:2]
+    
+    response = client.post('/review-queue/bulk', json={'action': 'remove', 'review_ids': listed})
+    assert response.get_json() == {'action': 'remove', 'reviewed': 2, 'deactivated': 2}
+    
+    with app.app_context():
+        assert ReviewQueue.query.filter_by(reviewed=False).count() == 1
+        assert Contractor.query.filter_by(candidate_status='Inactive').count() == 2
@@ -0,0 +1,51 @@
+import pytest
+from app import db
+from models import Contractor
+from search import search_contractors
+
+PEOPLE = [
+    ('Ada Lovelace', 'Analytical Engines Ltd', 'Software Engineer'),
+    ('Grace Hopper', 'Navy Yard', 'Compiler Engineer'),
+    ('Zelda Forklift', 'Acme Inc.', 'Forklift Operator'),
+    ('Miles O"Brien', 'Starfleet', 'Transporter Chief'),
+    ('Adam Smith', None, None),
+]
+
+def add_people():
+    db.session.add_all([
+        Contractor(talent_name=name, talent_id=f'T{n}', account_name=account, job_title=title)
+        for n, (name, account, title) in enumerate(PEOPLE)
+    ])
+    db.session.commit()
+
+def matching_names(search, backend='fts5'):
+    return {contractor.talent_name for contractor in search_contractors(Contractor.query, search, backend)}
+
+def test_index_follows_inserts_updates_and_deletes(app):
+    with app.app_context():
+        add_people()
+        assert matching_names('Forklift') == {'Zelda Forklift'}
+        
+        contractor = Contractor.query.filter_by(talent_name='Zelda Forklift').one()
+        contractor.talent_name = 'Zelda Crane'
+        contractor.job_title = 'Crane Operator'
+        db.session.commit()
+        assert matching_names('Forklift') == set()
+        assert matching_names('Crane') == {'Zelda Crane'}
+        
+        db.session.delete(contractor)
+        db.session.commit()
+        assert matching_names('Crane') == set()
+
+@pytest.mark.parametrize('search', ['ada', 'ENGINEER', 'acme inc', 'yard', 'O"Br', 'lift op', 'nobody'])
+def test_indexed_search_matches_the_ilike_search(app, search):
+    with app.app_context():
+        add_people()
+        assert matching_names(search) == matching_names(search, backend='like')
+
+def test_short_terms_fall_back_to_ilike(app):
+    with app.app_context():
+        add_people()
+        query = search_contractors(Contractor.query, 'Ad', 'fts5')
+        assert 'contractors_fts' not in str(query.statement)
+        assert {contractor.talent_name for contractor in query} == {'Ada Lovelace', 'Adam Smith'}
@@ -0,0 +1,113 @@
+import io
+import time
+import threading
+import pytest
+from datetime import datetime, timedelta
+from werkzeug.datastructures import FileStorage
+from app import db
+from models import UploadHistory, UploadStaging, User
+from jobs import JobQueue, fail_interrupted_uploads
+from utils import process_csv_upload
+
+def add_upload(status, heartbeat_age, staged_ids=()):
+    upload = UploadHistory(filename='report.csv', status=status, heartbeat_at=datetime.utcnow() - heartbeat_age)
+    db.session.add(upload)
+    db.session.flush()
+    db.session.add_all([UploadStaging(upload_id=upload.id, talent_id=talent_id) for talent_id in staged_ids])
+    db.session.commit()
+    return upload.id
+
+def test_only_uploads_gone_quiet_are_failed(app):
+    with app.app_context():
+        stale = add_upload('processing', timedelta(minutes=10), ['T1'])
+        queued = add_upload('queued', timedelta(minutes=10))
+        running = add_upload('processing', timedelta(seconds=5), ['T2'])
+        finished = add_upload('completed', timedelta(minutes=10), ['T3'])
+        
+        assert fail_interrupted_uploads() == 2
+        
+        statuses = {upload.id: upload.status for upload in UploadHistory.query}
+        assert statuses == {stale: 'failed', queued: 'failed', running: 'processing', finished: 'completed'}
+        assert db.session.get(UploadHistory, stale).error_message
+        assert [row.upload_id for row in UploadStaging.query] == [running]
+
+def test_completed_upload_clears_an_earlier_error(app):
+    with app.app_context():
+        upload_id = add_upload('failed', timedelta(minutes=10))
+        db.session.get(UploadHistory, upload_id).error_message = 'Stopped responding'
+        db.session.commit()
+        
+        report = FileStorage(io.BytesIO(b'Talent Name,Talent ID\nAda,T1\n'), filename='report.csv')
+        process_csv_upload(report, User.query.first().id, upload_id=upload_id)
+        
+        upload = db.session.get(UploadHistory, upload_id)
+        assert (upload.status, upload.error_message) == ('completed', None)
+
+def test_queue_heartbeats_the_jobs_it_holds():
+    beats = []
+    release = threading.Event()
+    jobs = JobQueue(heartbeat=beats.append, heartbeat_interval=0.01)
+    jobs.submit(1, release.wait)
+    jobs.submit(2, release.wait)
+    try:
+        deadline = time.monotonic() + 5
+        while not beats and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert sorted(beats[0]) == [1, 2]
+    finally:
+        release.set()
+        jobs.shutdown()
+
+REPORT = b'Talent Name,Talent ID,Candidate Status,Spread Amount\nAda,T1,Current,10\nGrace,T2,Current,20\n'
+
+def post_upload(client, report, **fields):
+    response = client.post('/upload', data={'file': (io.BytesIO(report), 'report.csv'), **fields},
+                           content_type='multipart/form-data', headers={'Accept': 'application/json'})
+    return response.status_code, response.get_json()
+
+def finish(app, job_id):
+    app.extensions['upload_jobs'].wait(job_id, timeout=30)
+
+def test_upload_is_queued_and_reports_its_stats(app, client):
+    status_code, queued = post_upload(client, REPORT)
+    assert status_code == 202
+    assert queued['duplicate'] is False
+    finish(app, queued['job_id'])
+    
+    status = client.get(queued['status_url']).get_json()
+    assert (status['state'], status['status'], status['error']) == ('completed', 'completed', None)
+    assert status['records_processed'] == 2
+    assert status['records_added'] == 2
+    assert status['chunks_processed'] == 1
+
+def test_unknown_upload_status_is_404(client):
+    assert client.get('/upload/999/status').status_code == 404
+
+def test_same_file_is_not_processed_twice_unless_forced(app, client):
+    _, first = post_upload(client, REPORT)
+    finish(app, first['job_id'])
+    
+    status_code, again = post_upload(client, REPORT)
+    assert (status_code, again['duplicate'], again['job_id']) == (200, True, first['job_id'])
+    
+    status_code, forced = post_upload(client, REPORT, force='y')
+    assert (status_code, forced['duplicate']) == (202, False)
+    finish(app, forced['job_id'])
+    assert client.get(forced['status_url']).get_json()['records_unchanged'] == 2
+    
+    with app.app_context():
+        assert UploadHistory.query.count() == 2
+
+def test_failed_upload_does_not_block_a_retry(app, client):
+    not_utf8 = b'Talent Name,Talent ID\nAda,T1\n\xff\n'
+    _, broken = post_upload(client, not_utf8)
+    with pytest.raises(UnicodeDecodeError):
+        finish(app, broken['job_id'])
+    status = client.get(broken['status_url']).get_json()
+    assert status['status'] == 'failed'
+    assert status['error']
+    
+    _, retried = post_upload(client, not_utf8)
+    assert retried['duplicate'] is False
+    with pytest.raises(UnicodeDecodeError):
+        finish(app, retried['job_id'])
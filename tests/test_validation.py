@@ -0,0 +1,16 @@
+import io
+from validation import validate_spread_report
+
+HEADER = 'Talent Name,Talent ID,Job Title,Spread Amount\n'
+ROWS = ''.join(f'Person {n},T{n},"Engineer\nlevel {n}",{n}\n' for n in range(40))
+
+def test_stray_quote_falls_back_to_reading_in_order(app):
+    # The stray quote flips the quote parity, so later cuts land inside the quoted job titles
+    report_csv = (HEADER + 'Acme "Temp,S1,Tech,5\n' + ROWS).encode()
+    
+    with app.app_context():
+        report = validate_spread_report(io.BytesIO(report_csv), block_size=64)
+    
+    assert report['rows'] == 41
+    assert report['error_count'] == 0
+    assert report['predicted']['added'] == 41
@@ -1,177 +1,391 @@
 import csv
-import pandas as pd
+import io
 from datetime import datetime
-from io import StringIO
+from sqlalchemy import Integer, select, insert, update, delete, literal
 from flask import current_app
 from werkzeug.utils import secure_filename
 from app import db
-from models import Contractor, ReviewQueue, UploadHistory
+from models import Contractor, ReviewQueue, UploadHistory, UploadStaging
+from aggregates import AggregateDelta, apply_aggregate_delta, record_pending_reviews
+from profiling import StageTimer, capture_profile
+from migrations import analyze_tables
+from snapshots import record_account_snapshot
+from accounts import resolve_account_ids
+from spread_report import (CSV_TEXT_COLUMNS, CSV_OPTIONAL_COLUMNS, CSV_VALUE_COLUMNS, parse_date,
+                           normalize_spread_frame, column_arrays_to_values, contractor_values_from_csv,
+                           contractor_values_hash)
 
 ALLOWED_EXTENSIONS = {'csv'}
 
+# Number of CSV rows parsed, written and committed together
+CSV_CHUNK_SIZE = 5000
+
+# Review queue reason for contractors absent from the latest upload
+MISSING_FROM_UPLOAD_REASON = 'Not found in latest upload - potential removal'
+
+# Defaults for new contractors when a text column is missing from the report
+CSV_TEXT_DEFAULTS = {
+    'candidate_status': 'Current',
+    'opt_out_mobile': 'No',
+}
+
+# Columns written back to the contractors table by the bulk upsert
+CONTRACTOR_WRITE_COLUMNS = (*CSV_VALUE_COLUMNS, 'account_id', 'row_hash', 'updated_at')
+
+# Columns prefetched for existing contractors before merging CSV values
+CONTRACTOR_PREFETCH_COLUMNS = ('id', *CONTRACTOR_WRITE_COLUMNS, 'created_at')
+
 def allowed_file(filename):
     """Check if the uploaded file has an allowed extension."""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def parse_date(date_string):
-    """Parse date string in various formats."""
-    if not date_string or date_string.strip() == '':
-        return None
-    
-    date_formats = ['%m/%d/%Y', '%Y-%m-%d', '%d-%m-%Y', '%m-%d-%Y']
-    
-    for fmt in date_formats:
-        try:
-            return datetime.strptime(date_string.strip(), fmt).date()
-        except ValueError:
-            continue
-    
-    return None
-
-def parse_decimal(value_string):
-    """Parse decimal values, handling various formats."""
-    if not value_string or value_string.strip() == '':
-        return None
+def iter_csv_frames(file, chunk_size=CSV_CHUNK_SIZE):
+    """Yield DataFrames of raw CSV text from an upload without reading it whole.
     
+    The upload is decoded incrementally, so only the current chunk of rows is
+    held in memory regardless of the file size. Every cell is a string; short
+    rows are padded and blank lines skipped, as csv.DictReader would.
+    """
+    import pandas as pd
+    stream = getattr(file, 'stream', file)
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8', newline='')
     try:
-        # Remove currency symbols and commas
-        cleaned = value_string.replace('$', '').replace(',', '').strip()
-        return float(cleaned)
-    except (ValueError, AttributeError):
-        return None
+        reader = csv.reader(text_stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        
+        width = len(header)
+        chunk = []
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != width:
+                row = (row + [''] * width)[:width]
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=header, dtype=object)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header, dtype=object)
+    finally:
+        # Hand the underlying stream back open and rewound
+        text_stream.detach()
+        stream.seek(0)
+
+def record_upload_progress(upload_record, stats, timer=None):
+    """Copy running upload totals (and stage timings) onto its UploadHistory record."""
+    upload_record.records_processed = stats['processed']
+    upload_record.records_added = stats['added']
+    upload_record.records_updated = stats['updated']
+    upload_record.records_unchanged = stats['unchanged']
+    upload_record.records_queued_for_review = stats['queued']
+    if timer is not None:
+        upload_record.stage_timings = timer.as_dict()
 
-def process_csv_upload(file, user_id):
+def process_csv_upload(file, user_id, chunk_size=CSV_CHUNK_SIZE, upload_id=None, profile=False):
     """Process uploaded CSV file and update contractor database."""
     
-    # Read the CSV file
+    # Queued jobs report into the record created when they were queued
+    if upload_id is not None:
+        upload_record = db.session.get(UploadHistory, upload_id)
+    else:
+        upload_record = UploadHistory(
+            filename=secure_filename(file.filename),
+            uploaded_by=user_id
+        )
+        db.session.add(upload_record)
+    upload_record.chunks_processed = 0
+    upload_record.status = 'processing'
+    upload_record.started_at = upload_record.heartbeat_at = datetime.utcnow()
+    db.session.commit()
+    
+    # Seconds per stage, saved on the record with the totals
+    timer = StageTimer()
+    # Account name -> id, resolved in bulk and reused by every chunk
+    account_ids = {}
     try:
-        # Read file content
-        file_content = file.read().decode('utf-8')
-        file.seek(0)  # Reset file pointer
-        
-        # Parse CSV
-        csv_reader = csv.DictReader(StringIO(file_content))
-        
         stats = {
             'processed': 0,
             'added': 0,
             'updated': 0,
+            'unchanged': 0,
             'queued': 0
         }
+        record_upload_progress(upload_record, stats)
         
-        # Get existing talent IDs for comparison
-        existing_talent_ids = set(
-            contractor.talent_id for contractor in 
-            Contractor.query.filter(Contractor.talent_id.isnot(None)).all()
-        )
-        
-        # Track current upload talent IDs
-        current_upload_ids = set()
-        
-        for row in csv_reader:
-            stats['processed'] += 1
-            
-            # Extract data from CSV row
-            talent_id = row.get('Talent ID', '').strip()
-            talent_name = row.get('Talent Name', '').strip()
-            
-            if not talent_name:
-                continue  # Skip empty rows
-            
-            current_upload_ids.add(talent_id)
+        with capture_profile(profile) as profiled:
+            # Chunks of rows are read, written and committed in turn, so memory stays flat
+            for frame in timer.iterate('read', iter_csv_frames(file, chunk_size)):
+                stats['processed'] += len(frame)
+                
+                with timer.stage('normalize'):
+                    # Skip rows without a talent name
+                    if 'Talent Name' in frame:
+                        frame = frame[frame['Talent Name'].str.strip() != '']
+                    else:
+                        frame = frame.iloc[0:0]
+                    
+                    columns = normalize_spread_frame(frame)
+                    values_list = column_arrays_to_values(columns)
+                
+                with timer.stage('stage'):
+                    stage_upload_talent_ids(upload_record.id, {talent_id for talent_id in columns['talent_id'] if talent_id})
+                
+                upsert_contractor_batch(values_list, user_id, stats, timer, account_ids)
+                
+                # Commit the chunk along with the progress made so far
+                with timer.stage('commit'):
+                    record_upload_progress(upload_record, stats, timer)
+                    upload_record.chunks_processed += 1
+                    upload_record.heartbeat_at = datetime.utcnow()
+                    db.session.commit()
             
-            # Check if contractor exists
-            existing_contractor = None
-            if talent_id:
-                existing_contractor = Contractor.query.filter_by(talent_id=talent_id).first()
+            # Queue contractors that are no longer in the upload (potential removals)
+            with timer.stage('review_queue'):
+                stats['queued'] = queue_missing_contractors(upload_record.id, user_id)
+                clear_upload_staging(upload_record.id)
             
-            if existing_contractor:
-                # Update existing contractor
-                update_contractor_from_csv(existing_contractor, row)
-                stats['updated'] += 1
-            else:
-                # Create new contractor
-                contractor = create_contractor_from_csv(row, user_id)
-                if contractor:
-                    db.session.add(contractor)
-                    stats['added'] += 1
-        
-        # Find contractors that are no longer in the upload (potential removals)
-        missing_contractors = Contractor.query.filter(
-            Contractor.talent_id.notin_(current_upload_ids),
-            Contractor.candidate_status == 'Current'
-        ).all()
+            # Per-account totals as of this upload, for the trend analytics
+            with timer.stage('snapshot'):
+                record_account_snapshot(upload_record.id)
         
-        # Queue missing contractors for review
-        for contractor in missing_contractors:
-            existing_review = ReviewQueue.query.filter_by(
-                contractor_id=contractor.id,
-                reviewed=False
-            ).first()
+        # Mark the upload as finished
+        with timer.stage('commit'):
+            upload_record.profile_report = profiled['report']
+            upload_record.status = 'completed'
+            # A sweep may have given up on this upload while it was still running
+            upload_record.error_message = None
+            upload_record.completed_at = datetime.utcnow()
+            record_upload_progress(upload_record, stats, timer)
+            db.session.commit()
             
-            if not existing_review:
-                review_item = ReviewQueue(
-                    contractor_id=contractor.id,
-                    reason='Not found in latest upload - potential removal',
-                    added_by=user_id
-                )
-                db.session.add(review_item)
-                stats['queued'] += 1
-        
-        # Save upload history
-        upload_record = UploadHistory(
-            filename=secure_filename(file.filename),
-            uploaded_by=user_id,
-            records_processed=stats['processed'],
-            records_added=stats['added'],
-            records_updated=stats['updated'],
-            records_queued_for_review=stats['queued'],
-            status='completed'
-        )
-        db.session.add(upload_record)
-        
-        # Commit all changes
-        db.session.commit()
+            # Large uploads shift the data distribution the planner relies on
+            analyze_tables(db.session.connection(), [Contractor.__table__, ReviewQueue.__table__])
+            db.session.commit()
         
         return stats
         
     except Exception as e:
         db.session.rollback()
+        clear_upload_staging(upload_record.id)
         
         # Log error in upload history
-        error_record = UploadHistory(
-            filename=secure_filename(file.filename),
-            uploaded_by=user_id,
-            status='failed',
-            error_message=str(e)
-        )
-        db.session.add(error_record)
+        upload_record.status = 'failed'
+        upload_record.error_message = str(e)
+        upload_record.completed_at = datetime.utcnow()
+        upload_record.stage_timings = timer.as_dict()
         db.session.commit()
         
         raise e
 
+def stage_upload_talent_ids(upload_id, talent_ids):
+    """Record the talent IDs seen in an upload chunk in the staging table."""
+    if talent_ids:
+        db.session.execute(
+            insert(UploadStaging),
+            [{'upload_id': upload_id, 'talent_id': talent_id} for talent_id in talent_ids]
+        )
+
+def clear_upload_staging(upload_id):
+    """Drop the staged talent IDs of a finished or failed upload."""
+    db.session.execute(delete(UploadStaging).where(UploadStaging.upload_id == upload_id))
+
+def queue_missing_contractors(upload_id, user_id):
+    """Queue current contractors missing from an upload for review.
+    
+    A single INSERT ... SELECT anti-joins contractors against the talent IDs
+    staged for the upload and skips contractors that already have an
+    unreviewed entry. Returns the number of review items created.
+    """
+    in_upload = select(UploadStaging.id).where(
+        UploadStaging.upload_id == upload_id,
+        UploadStaging.talent_id == Contractor.talent_id
+    )
+    already_queued = select(ReviewQueue.id).where(
+        ReviewQueue.contractor_id == Contractor.id,
+        ReviewQueue.reviewed == False
+    )
+    missing = select(
+        Contractor.id,
+        literal(upload_id, Integer),
+        literal(MISSING_FROM_UPLOAD_REASON),
+        literal(datetime.utcnow()),
+        literal(user_id, Integer),
+        literal(False)
+    ).where(
+        Contractor.candidate_status == 'Current',
+        Contractor.talent_id.isnot(None),
+        ~in_upload.exists(),
+        ~already_queued.exists()
+    )
+    
+    result = db.session.execute(
+        insert(ReviewQueue.__table__).from_select(
+            ['contractor_id', 'upload_id', 'reason', 'added_at', 'added_by', 'reviewed'], missing
+        )
+    )
+    record_pending_reviews(result.rowcount)
+    return result.rowcount
+
+def new_contractor_values(values, user_id):
+    """Build the full column set for a contractor created from CSV values."""
+    now = datetime.utcnow()
+    new_values = {attr: CSV_TEXT_DEFAULTS.get(attr, '') for attr in CSV_TEXT_COLUMNS}
+    new_values['account_id'] = None
+    new_values.update(values)
+    if new_values['days_since_service'] is None:
+        new_values['days_since_service'] = 0
+    new_values['created_by'] = user_id
+    new_values['created_at'] = now
+    new_values['updated_at'] = now
+    return new_values
+
+def merge_contractor_values(current, values):
+    """Apply CSV values on top of a contractor's current column values.
+    
+    Text columns present in the report overwrite the stored value, while
+    dates, spread and days since service only overwrite it when they parsed.
+    """
+    merged = dict(current)
+    for attr in CSV_TEXT_COLUMNS:
+        if attr in values:
+            merged[attr] = values[attr]
+    for attr in CSV_OPTIONAL_COLUMNS:
+        if values[attr] is not None:
+            merged[attr] = values[attr]
+    if 'account_id' in values:
+        merged['account_id'] = values['account_id']
+    merged['row_hash'] = values.get('row_hash')
+    merged['updated_at'] = datetime.utcnow()
+    return merged
+
+def upsert_contractor_batch(values_list, user_id, stats, timer=None, account_ids=None):
+    """Insert or update a batch of normalized CSV values with set-based statements.
+    
+    Each row is hashed and compared with the hash stored by the upload that
+    last wrote the contractor; matching rows are counted as unchanged and
+    never written. Only the contractors that did change are prefetched in
+    full, merged in memory and written back together with the new rows.
+    Their account names are resolved to ids through the ``account_ids`` map.
+    """
+    timer = timer or StageTimer()
+    
+    with timer.stage('lookup'):
+        for values in values_list:
+            values['row_hash'] = contractor_values_hash(values)
+        
+        talent_ids = {values['talent_id'] for values in values_list if values['talent_id']}
+        stored_hashes = {}
+        if talent_ids:
+            stored_hashes = dict(db.session.execute(
+                select(Contractor.talent_id, Contractor.row_hash)
+                .where(Contractor.talent_id.in_(talent_ids))
+            ).all())
+        
+        changed = []
+        changed_ids = set()
+        for values in values_list:
+            talent_id = values['talent_id']
+            if (talent_id in stored_hashes and talent_id not in changed_ids
+                    and values['row_hash'] == stored_hashes[talent_id]):
+                stats['unchanged'] += 1
+                continue
+            changed.append(values)
+            if talent_id:
+                changed_ids.add(talent_id)
+        
+        existing = {}
+        refetch = changed_ids & stored_hashes.keys()
+        if refetch:
+            prefetch = db.session.execute(
+                select(*[getattr(Contractor, attr) for attr in CONTRACTOR_PREFETCH_COLUMNS])
+                .where(Contractor.talent_id.in_(refetch))
+            )
+            existing = {row.talent_id: row._asdict() for row in prefetch}
+        
+        account_ids = resolve_account_ids({values['account_name'] for values in changed if 'account_name' in values},
+                                          account_ids)
+        for values in changed:
+            if 'account_name' in values:
+                values['account_id'] = account_ids[values['account_name']]
+    
+    pending = {}
+    anonymous = []
+    for values in changed:
+        talent_id = values['talent_id']
+        if talent_id in pending:
+            # Same Talent ID twice in one report: later rows update the earlier one
+            pending[talent_id] = merge_contractor_values(pending[talent_id], values)
+            stats['updated'] += 1
+        elif talent_id in existing:
+            pending[talent_id] = merge_contractor_values(existing[talent_id], values)
+            stats['updated'] += 1
+        elif talent_id:
+            pending[talent_id] = new_contractor_values(values, user_id)
+            stats['added'] += 1
+        else:
+            anonymous.append(new_contractor_values(values, user_id))
+            stats['added'] += 1
+    
+    with timer.stage('write'):
+        write_contractor_rows(list(pending.values()) + anonymous, user_id)
+    
+    # Keep the dashboard aggregates in step with the rows just written
+    with timer.stage('aggregates'):
+        delta = AggregateDelta()
+        for talent_id, row in pending.items():
+            if talent_id in existing:
+                delta.change(existing[talent_id], row)
+            else:
+                delta.add(row)
+        for row in anonymous:
+            delta.add(row)
+        apply_aggregate_delta(delta)
+
+def write_contractor_rows(rows, user_id):
+    """Write merged contractor rows using the fastest path the database offers.
+    
+    PostgreSQL gets a batched INSERT ... ON CONFLICT (talent_id) DO UPDATE.
+    Other backends fall back to an executemany INSERT for new rows and an
+    executemany UPDATE by primary key for existing ones.
+    """
+    if not rows:
+        return
+    
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        
+        insert_rows = []
+        for row in rows:
+            insert_row = {attr: row[attr] for attr in CONTRACTOR_WRITE_COLUMNS}
+            insert_row['created_by'] = row.get('created_by', user_id)
+            insert_row['created_at'] = row.get('created_at', row['updated_at'])
+            insert_rows.append(insert_row)
+        
+        stmt = pg_insert(Contractor.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Contractor.__table__.c.talent_id],
+            set_={attr: stmt.excluded[attr] for attr in CONTRACTOR_WRITE_COLUMNS if attr != 'talent_id'}
+        )
+        db.session.execute(stmt, insert_rows)
+        return
+    
+    new_rows = [row for row in rows if 'id' not in row]
+    changed_rows = [row for row in rows if 'id' in row]
+    if new_rows:
+        db.session.execute(insert(Contractor), new_rows)
+    if changed_rows:
+        db.session.execute(update(Contractor), changed_rows)
+
 def create_contractor_from_csv(row, user_id):
     """Create a new contractor from CSV row data."""
     try:
-        contractor = Contractor(
-            talent_name=row.get('Talent Name', '').strip(),
-            job_title=row.get('Job Title', '').strip(),
-            candidate_status=row.get('Candidate Status', 'Current').strip(),
-            talent_start_date=parse_date(row.get('Talent Start Date', '')),
-            talent_end_date=parse_date(row.get('Talent End Date', '')),
-            mobile=row.get('Mobile', '').strip(),
-            talent_id=row.get('Talent ID', '').strip(),
-            recruiter=row.get('Recruiter', '').strip(),
-            peoplesoft_id=row.get('Peoplesoft ID', '').strip(),
-            account_manager=row.get('Account Manager', '').strip(),
-            account_name=row.get('Account Name', '').strip(),
-            spread_amount=parse_decimal(row.get('Spread Amount', '') or row.get('Weekly Spread', '') or row.get('Spread', '')),
-            days_since_service=int(row.get('Days Since Service', 0)) if row.get('Days Since Service', '').strip().isdigit() else 0,
-            opt_out_mobile=row.get('PrefCentre_Aerotek_OptOut_Mobile', 'No').strip(),
-            created_by=user_id
-        )
-        return contractor
+        values = contractor_values_from_csv(row)
+        if 'account_name' in values:
+            values['account_id'] = resolve_account_ids([values['account_name']])[values['account_name']]
+        return Contractor(**new_contractor_values(values, user_id))
     except Exception as e:
         current_app.logger.error(f"Error creating contractor from CSV row: {e}")
         return None
@@ -179,27 +393,13 @@ def create_contractor_from_csv(row, user_id):
 def update_contractor_from_csv(contractor, row):
     """Update existing contractor with CSV row data."""
     try:
-        contractor.talent_name = row.get('Talent Name', contractor.talent_name).strip()
-        contractor.job_title = row.get('Job Title', contractor.job_title).strip()
-        contractor.candidate_status = row.get('Candidate Status', contractor.candidate_status).strip()
-        contractor.talent_start_date = parse_date(row.get('Talent Start Date', '')) or contractor.talent_start_date
-        contractor.talent_end_date = parse_date(row.get('Talent End Date', '')) or contractor.talent_end_date
-        contractor.mobile = row.get('Mobile', contractor.mobile).strip()
-        contractor.recruiter = row.get('Recruiter', contractor.recruiter).strip()
-        contractor.peoplesoft_id = row.get('Peoplesoft ID', contractor.peoplesoft_id).strip()
-        contractor.account_manager = row.get('Account Manager', contractor.account_manager).strip()
-        contractor.account_name = row.get('Account Name', contractor.account_name).strip()
-        contractor.opt_out_mobile = row.get('PrefCentre_Aerotek_OptOut_Mobile', contractor.opt_out_mobile).strip()
-        contractor.updated_at = datetime.utcnow()
-        
-        # Update spread amount if provided
-        spread_amount = parse_decimal(row.get('Spread Amount', '') or row.get('Weekly Spread', '') or row.get('Spread', ''))
-        if spread_amount is not None:
-            contractor.spread_amount = spread_amount
-        
-        days_since = row.get('Days Since Service', '').strip()
-        if days_since.isdigit():
-            contractor.days_since_service = int(days_since)
-            
+        current = {attr: getattr(contractor, attr) for attr in CONTRACTOR_WRITE_COLUMNS}
+        values = contractor_values_from_csv(row)
+        if 'account_name' in values:
+            values['account_id'] = resolve_account_ids([values['account_name']])[values['account_name']]
+        merged = merge_contractor_values(current, values)
+        for attr, value in merged.items():
+            if attr != 'talent_id':
+                setattr(contractor, attr, value)
     except Exception as e:
         current_app.logger.error(f"Error updating contractor from CSV row: {e}")
@@ -0,0 +1,275 @@
+import io
+import csv
+import time
+import logging
+import itertools
+import threading
+from collections import deque
+from sqlalchemy import select
+from app import db
+from models import Contractor, ReviewQueue
+from spread_report import QuoteParityError, validate_report_block, validate_report_records
+from utils import CSV_CHUNK_SIZE
+
+# Bytes of whole records handed to a validation worker at a time
+VALIDATION_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Blocks read without finding a record boundary before the quotes are
+# taken to be unbalanced (no record is anywhere near this long)
+UNBALANCED_QUOTE_BLOCKS = 4
+
+# Row errors listed in a report; the per-column counts cover all of them
+MAX_REPORTED_ERRORS = 1000
+
+# Header columns reported when missing: without a name every row is
+# skipped, without an ID every row is added as a new contractor
+EXPECTED_COLUMNS = ('Talent Name', 'Talent ID')
+
+class UploadPrediction:
+    """Replay upsert_contractor_batch's change detection over report rows without writing."""
+    
+    def __init__(self, stored_hashes, chunk_size=CSV_CHUNK_SIZE):
+        self.hashes = stored_hashes
+        self.chunk_size = chunk_size
+        self.chunk = 0
+        self.written = {}
+        self.counts = {'added': 0, 'updated': 0, 'unchanged': 0}
+    
+    def add(self, talent_id, row_hash, row_index):
+        """Count one named row; ``row_index`` is its non-blank row number in the file."""
+        # Hashes written by one chunk are what the next chunk is compared with
+        chunk = row_index // self.chunk_size
+        if chunk != self.chunk:
+            self.hashes.update(self.written)
+            self.written = {}
+            self.chunk = chunk
+        
+        if talent_id is None:
+            self.counts['added'] += 1
+            return
+        # A Talent ID already changed in this chunk stays changed
+        if talent_id not in self.written and self.hashes.get(talent_id) == row_hash:
+            self.counts['unchanged'] += 1
+            return
+        if talent_id in self.written or talent_id in self.hashes:
+            self.counts['updated'] += 1
+        else:
+            self.counts['added'] += 1
+        self.written[talent_id] = row_hash
+
+def record_boundary(data, last=True):
+    """Offset just past the last (or first) newline in ``data`` that ends a CSV record, or None."""
+    # Escaped quotes come in pairs, so a newline ends a record when an even number of quotes precede it
+    if last:
+        position, quotes = len(data), data.count(b'"')
+        while True:
+            newline = data.rfind(b'\n', 0, position)
+            if newline < 0:
+                return None
+            quotes -= data.count(b'"', newline, position)
+            if quotes % 2 == 0:
+                return newline + 1
+            position = newline
+    
+    position, quotes = 0, 0
+    while True:
+        newline = data.find(b'\n', position)
+        if newline < 0:
+            return None
+        quotes += data.count(b'"', position, newline)
+        if quotes % 2 == 0:
+            return newline + 1
+        position = newline + 1
+
+def iter_record_blocks(stream, block_size=VALIDATION_BLOCK_SIZE):
+    """Yield the bytes of a CSV stream in blocks that end on record boundaries."""
+    pending = b''
+    for data in iter(lambda: stream.read(block_size), b''):
+        pending += data
+        end = record_boundary(pending)
+        if end is not None:
+            yield pending[:end]
+            pending = pending[end:]
+        elif len(pending) > UNBALANCED_QUOTE_BLOCKS * block_size:
+            raise QuoteParityError('No record boundary found; the quotes do not pair up')
+    if pending:
+        yield pending
+
+def iter_record_batches(stream, batch_size=CSV_CHUNK_SIZE):
+    """Read a CSV stream in order with csv.reader: its header, then lists of records."""
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    try:
+        reader = csv.reader(text)
+        yield next(reader, [])
+        while True:
+            batch = list(itertools.islice(reader, batch_size))
+            if not batch:
+                return
+            yield batch
+    finally:
+        # Leave the caller's stream open
+        text.detach()
+
+class ValidationPool:
+    """Worker processes shared by every dry-run validation, started on first use."""
+    
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # Forking a threaded web server is unsafe, so workers come from a forkserver
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('forkserver')
+                    context.set_forkserver_preload(['spread_report', 'pandas'])
+                else:
+                    context = multiprocessing.get_context('spawn')
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+    
+    def map(self, header, blocks):
+        """Run validate_report_block over ``blocks`` and yield the results in order."""
+        from concurrent.futures.process import BrokenProcessPool
+        executor = self._get_executor()
+        pending = deque()
+        try:
+            for block in blocks:
+                pending.append(executor.submit(validate_report_block, header, block, MAX_REPORTED_ERRORS))
+                # Two blocks per worker in flight, so a large file is never held whole
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next validation
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+    
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+def map_report_blocks(header, blocks, pool=None):
+    """Validate ``blocks`` on ``pool``, or one after another in this process without one."""
+    if pool is None:
+        return (validate_report_block(header, block, MAX_REPORTED_ERRORS) for block in blocks)
+    return pool.map(header, blocks)
+
+def stored_row_hashes():
+    """Talent ID -> row hash of every stored contractor that has an ID."""
+    return dict(db.session.execute(
+        select(Contractor.talent_id, Contractor.row_hash).where(Contractor.talent_id.isnot(None))
+    ).all())
+
+def reviewable_talent_ids():
+    """Talent IDs an upload would queue for review if they were missing from it."""
+    already_queued = select(ReviewQueue.id).where(
+        ReviewQueue.contractor_id == Contractor.id,
+        ReviewQueue.reviewed == False
+    )
+    return set(db.session.execute(
+        select(Contractor.talent_id).where(
+            Contractor.candidate_status == 'Current',
+            Contractor.talent_id.isnot(None),
+            ~already_queued.exists()
+        )
+    ).scalars())
+
+def validate_spread_report(file, pool=None, block_size=VALIDATION_BLOCK_SIZE):
+    """Check a spread report and predict what uploading it would change, writing nothing."""
+    start = time.perf_counter()
+    stream = getattr(file, 'stream', file)
+    stored_hashes = stored_row_hashes()
+    reviewable = reviewable_talent_ids()
+    
+    # Blocks of whole records are parsed by the pool, or here without one
+    try:
+        blocks = iter_record_blocks(stream, block_size)
+        first = next(blocks, b'')
+        header_end = record_boundary(first, last=False) or len(first)
+        try:
+            header = next(csv.reader(io.StringIO(first[:header_end].decode('utf-8'), newline=''), strict=True), [])
+        except csv.Error as e:
+            raise QuoteParityError(f'Header is not one whole record: {e}')
+        blocks = itertools.chain([first[header_end:]], blocks)
+        report = merge_report_results(header, map_report_blocks(header, blocks, pool),
+                                      dict(stored_hashes), reviewable)
+        report['workers'] = pool.workers if pool else 1
+    except QuoteParityError as e:
+        # Boundaries come from quote parity, which a stray quote in an unquoted field throws off
+        logging.info(f"Validating the report in a single pass: {e}")
+        stream.seek(0)
+        batches = iter_record_batches(stream)
+        header = next(batches)
+        results = (validate_report_records(header, batch, MAX_REPORTED_ERRORS) for batch in batches)
+        report = merge_report_results(header, results, stored_hashes, reviewable)
+        report['workers'] = 1
+    
+    report['filename'] = getattr(file, 'filename', None)
+    report['elapsed_seconds'] = round(time.perf_counter() - start, 3)
+    return report
+
+def merge_report_results(header, results, stored_hashes, reviewable):
+    """Combine per-block validation results into one report, in file order."""
+    prediction = UploadPrediction(stored_hashes)
+    first_rows = {}
+    report = {
+        'rows': 0,
+        'skipped': 0,
+        'invalid_rows': 0,
+        'duplicate_talent_ids': 0,
+        'error_count': 0,
+        'errors_by_column': {},
+        'errors': [],
+        'missing_columns': [column for column in EXPECTED_COLUMNS if column not in header],
+    }
+    
+    def add_error(row, column, value, message):
+        report['error_count'] += 1
+        report['errors_by_column'][column] = report['errors_by_column'].get(column, 0) + 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': row, 'column': column, 'value': value, 'message': message})
+    
+    first_row = 2
+    row_offset = 0
+    for result in results:
+        report['error_count'] += sum(result['error_counts'].values())
+        for column, count in result['error_counts'].items():
+            report['errors_by_column'][column] = report['errors_by_column'].get(column, 0) + count
+        for position, column, value, message in result['errors'][:MAX_REPORTED_ERRORS - len(report['errors'])]:
+            report['errors'].append({'row': first_row + position, 'column': column, 'value': value, 'message': message})
+        
+        for talent_id, row_hash, position, row_index in zip(result['talent_ids'], result['row_hashes'],
+                                                            result['positions'], result['row_indexes']):
+            prediction.add(talent_id, row_hash, row_offset + row_index)
+            if talent_id is None:
+                continue
+            if talent_id in first_rows:
+                report['duplicate_talent_ids'] += 1
+                add_error(first_row + position, 'Talent ID', talent_id,
+                          f'Duplicate Talent ID, first seen on row {first_rows[talent_id]}; this row updates it')
+            else:
+                first_rows[talent_id] = first_row + position
+        
+        report['rows'] += result['rows']
+        report['skipped'] += result['skipped']
+        report['invalid_rows'] += result['invalid_rows']
+        first_row += result['records']
+        row_offset += result['rows']
+    
+    report['errors'].sort(key=lambda error: error['row'])
+    report['errors_truncated'] = report['error_count'] > len(report['errors'])
+    report['predicted'] = {**prediction.counts, 'queued': len(reviewable - first_rows.keys())}
+    return report